@@ -1,29 +1,79 @@
 import streamlit as st
+import bisect
+import calendar
+import csv
 import datetime
+import gzip
+import hashlib
+import heapq
+import io
+import itertools
 import json
+import math
 import os
+import re
+import sqlite3
+import sys
+import tempfile
+import threading
+import traceback
+import unicodedata
+import uuid
+import zipfile
+import zlib
+import numpy as np
 import pandas as pd
 from collections import defaultdict # Für Gruppierungen
 import plotly.express as px # Für einfache Visualisierungen
+import plotly.io as pio
+import pyarrow as pa # Wird mit Streamlit installiert
+import pyarrow.parquet as pq
+from collections import OrderedDict
 
 # --- Konfiguration ---
 DATA_FILE = "tasks.json"
+STORAGE_BACKEND = "json" # "json" (DATA_FILE + Journal) oder "sqlite" (SQLITE_FILE)
+SQLITE_FILE = "tasks.db"
+STORAGE_MODE = "journal" # Nur JSON: "journal" (nur Änderungen anhängen) oder "snapshot" (Datei bei jeder Änderung neu schreiben)
+JOURNAL_FILE = "tasks.journal.jsonl" # Append-only Protokoll, eine JSON-Zeile pro Änderung
+JOURNAL_COMPACT_BYTES = 1024 * 1024 # Ab dieser Größe wird das Journal in DATA_FILE zurückgefaltet
+TOMBSTONE_FILE = "tasks.tombstones.jsonl" # Nur JSON: gelöschte Aufgaben (ID + Revision) für den Delta-Export
+REPORT_CACHE_MAX_BYTES = 64 * 1024 * 1024 # Speichergrenze für zwischengespeicherte Berichte (DataFrames, Diagramm-JSON)
+IMPORT_BATCH_SIZE = 1000 # Importierte Einträge werden in Blöcken dieser Größe geprüft
+EXPORT_CHUNK_SIZE = 1000 # Aufgaben pro geschriebenem Block beim Export
+EXPORT_FILE_MAX_AGE_SECONDS = 3600 # Nie heruntergeladene Exportdateien (verlassene Sessions) werden danach entfernt
+IMPORT_NEAR_DUPLICATE_THRESHOLD = 0.8 # Jaccard-Ähnlichkeit der Titel-Trigramme, ab der ein Import als ähnlich gilt
+RECURRENCE_CATCH_UP_LIMIT = 31 # Höchstens so viele verpasste Termine einer Serie werden nachträglich erzeugt
+RECURRENCE_MAX_STEPS = 1000 # Obergrenze der pro Serie und Lauf geprüften Termine (Schutz vor Endlosschleifen)
+CHART_MAX_POINTS = 2000 # Zeitreihen mit mehr Punkten werden per LTTB auf diese Anzahl reduziert
+CHART_WEBGL_THRESHOLD = 1000 # Ab so vielen Punkten werden Liniendiagramme mit WebGL statt SVG gezeichnet
+CHART_MAX_CATEGORIES = 20 # Weitere Kategorien (Personen, Tags) werden in "Sonstige" zusammengefasst
 
 # --- Datenmodell (für Tasks) ---
+def intern_value(value):
+    # Wiederkehrende Werte (Priorität, Status, Zuständige, Tags) nur einmal im Speicher halten
+    return sys.intern(value) if isinstance(value, str) else value
+
 class Task:
-    def __init__(self, id, title, description, due_date, priority, status, assigned_to=None, tags=None, notes=None, created_at=None, completed_at=None, recurrence=None):
+    # __slots__ spart das __dict__ pro Instanz. Tags und Notizen sind Tupel, leere Listen teilen sich
+    # das leere Tupel; Änderungen ersetzen daher das Tupel (siehe add_note_to_task).
+    __slots__ = ("id", "title", "description", "due_date", "priority", "status", "assigned_to",
+                 "tags", "notes", "created_at", "completed_at", "recurrence", "revision")
+
+    def __init__(self, id, title, description, due_date, priority, status, assigned_to=None, tags=None, notes=None, created_at=None, completed_at=None, recurrence=None, revision=0):
         self.id = id
         self.title = title
         self.description = description
         self.due_date = due_date
-        self.priority = priority # Low, Medium, High, Urgent
-        self.status = status     # To Do, In Progress, On Hold, Completed, Cancelled
-        self.assigned_to = assigned_to
-        self.tags = tags if tags is not None else []
-        self.notes = notes if notes is not None else []
+        self.priority = intern_value(priority) # Low, Medium, High, Urgent
+        self.status = intern_value(status)     # To Do, In Progress, On Hold, Completed, Cancelled
+        self.assigned_to = intern_value(assigned_to)
+        self.tags = tuple(intern_value(tag) for tag in tags) if tags else ()
+        self.notes = tuple(notes) if notes else ()
         self.created_at = created_at if created_at else datetime.datetime.now().isoformat()
         self.completed_at = completed_at
         self.recurrence = recurrence # z.B. {'type': 'daily', 'interval': 1} oder None
+        self.revision = revision # Änderungszähler aus TaskRegistry.touch, Grundlage für den Delta-Export
 
     def to_dict(self):
         return {
@@ -34,11 +84,12 @@ class Task:
             "priority": self.priority,
             "status": self.status,
             "assigned_to": self.assigned_to,
-            "tags": self.tags,
-            "notes": self.notes,
+            "tags": list(self.tags),
+            "notes": list(self.notes),
             "created_at": self.created_at,
             "completed_at": self.completed_at,
-            "recurrence": self.recurrence
+            "recurrence": self.recurrence,
+            "revision": self.revision
         }
 
     @staticmethod
@@ -63,6 +114,8 @@ class Task:
                     recurrence_data['interval'] = int(recurrence_data['interval'])
                 except (ValueError, TypeError):
                     recurrence_data['interval'] = 1 # Standardwert, falls Konvertierung fehlschlägt
+            if recurrence_data.get('interval', 1) < 1:
+                recurrence_data = None # Intervall 0 oder negativ: keine Wiederholung
         else:
             recurrence_data = None
 
@@ -79,29 +132,1912 @@ class Task:
             notes=data.get("notes"),
             created_at=data.get("created_at"),
             completed_at=data.get("completed_at"),
-            recurrence=recurrence_data # Hier die korrigierten Daten verwenden
+            recurrence=recurrence_data, # Hier die korrigierten Daten verwenden
+            revision=data.get("revision") or 0
         )
 
-# --- Hilfsfunktionen für Datenhandling (JSON) ---
-def load_tasks():
-    if os.path.exists(DATA_FILE):
-        with open(DATA_FILE, "r", encoding="utf-8") as f:
+# --- Speicher-Backends ---
+PRIORITY_ORDER = {"Urgent": 0, "High": 1, "Medium": 2, "Low": 3}
+STATUS_ORDER = {"To Do": 0, "In Progress": 1, "On Hold": 2, "Completed": 3, "Cancelled": 4}
+TASK_SORT_KEYS = {
+    "Due Date": lambda task: task.due_date if task.due_date else NO_DUE_DATE,
+    "Priority": lambda task: PRIORITY_ORDER.get(task.priority, 99),
+    "Status": lambda task: STATUS_ORDER.get(task.status, 99),
+    "Created At": lambda task: task.created_at,
+    "Title": lambda task: task.title.lower(),
+    # Reihenfolge der aktuellen Aufgaben im Dashboard
+    "Due Date, Priority": lambda task: (task.due_date if task.due_date else NO_DUE_DATE, PRIORITY_ORDER.get(task.priority, 99)),
+}
+
+class TaskStore:
+    # Gemeinsame Schnittstelle aller Backends. Backends mit supports_queries = True
+    # können Filter, Sortierung und Zählungen selbst ausführen (query_tasks, count_tasks).
+    supports_queries = False
+
+    def load_all(self):
+        raise NotImplementedError
+
+    def save_all(self, tasks):
+        raise NotImplementedError
+
+    def save_task(self, task):
+        raise NotImplementedError
+
+    def save_tasks(self, tasks):
+        # Mehrere Aufgaben in einem Schreibvorgang; Backends können das effizienter überschreiben
+        for task in tasks:
+            self.save_task(task)
+
+    def delete_task(self, task_id):
+        raise NotImplementedError
+
+    def apply_changes(self, tasks, deleted_ids):
+        # Geänderte und gelöschte Aufgaben gemeinsam, z.B. für Sammelaktionen
+        for task in tasks:
+            self.save_task(task)
+        for task_id in deleted_ids:
+            self.delete_task(task_id)
+
+    def load_tombstones(self):
+        # Liste von (Revision, Aufgaben-ID) gelöschter Aufgaben, aufsteigend nach Revision
+        raise NotImplementedError
+
+    def save_tombstones(self, tombstones):
+        raise NotImplementedError
+
+def read_journal_records(path):
+    # JSON-Zeilen bis zum ersten unvollständigen Eintrag. Ein abgebrochener letzter Schreibvorgang wird
+    # abgeschnitten, sonst hinge der nächste Eintrag am Bruchstück und ginge beim Laden verloren.
+    records = []
+    if not os.path.exists(path):
+        return records
+    good_bytes = 0
+    with open(path, "r+b") as f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
             try:
-                data = json.load(f)
-                return [Task.from_dict(d) for d in data]
-            except json.JSONDecodeError:
-                return [] # Leere Liste, falls JSON fehlerhaft ist
-    return []
+                records.append(json.loads(line))
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                break
+            good_bytes += len(line)
+        if f.seek(0, os.SEEK_END) > good_bytes:
+            f.truncate(good_bytes)
+    return records
+
+class JsonTaskStore(TaskStore):
+    # tasks.json als Snapshot plus Append-only Journal für einzelne Änderungen
+    def __init__(self, data_file=DATA_FILE, journal_file=JOURNAL_FILE, mode=STORAGE_MODE, tombstone_file=TOMBSTONE_FILE):
+        self.data_file = data_file
+        self.journal_file = journal_file
+        self.mode = mode
+        self.tombstone_file = tombstone_file
+
+    def load_all(self):
+        tasks_by_id = {}
+        if os.path.exists(self.data_file):
+            with open(self.data_file, "r", encoding="utf-8") as f:
+                try:
+                    data = json.load(f)
+                    for d in data:
+                        task = Task.from_dict(d)
+                        tasks_by_id[task.id] = task
+                except json.JSONDecodeError:
+                    pass # Leere Liste, falls JSON fehlerhaft ist
+        self._replay_journal(tasks_by_id)
+        return list(tasks_by_id.values())
+
+    def _replay_journal(self, tasks_by_id):
+        # Spielt die seit dem letzten Snapshot angehängten Änderungen in Reihenfolge nach
+        for record in read_journal_records(self.journal_file):
+            if record.get("op") == "upsert":
+                task = Task.from_dict(record["task"])
+                tasks_by_id[task.id] = task
+            elif record.get("op") == "delete":
+                tasks_by_id.pop(record["id"], None)
+
+    def save_all(self, tasks):
+        # Vollständiger Snapshot: atomar schreiben, danach ist das Journal überflüssig
+        tmp_file = self.data_file + ".tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump([task.to_dict() for task in tasks], f, indent=4, ensure_ascii=False)
+        os.replace(tmp_file, self.data_file)
+        if os.path.exists(self.journal_file):
+            os.remove(self.journal_file)
+
+    def save_task(self, task):
+        self._append({"op": "upsert", "task": task.to_dict()})
+
+    def save_tasks(self, tasks):
+        self._append(*({"op": "upsert", "task": task.to_dict()} for task in tasks))
+
+    def delete_task(self, task_id):
+        self._append({"op": "delete", "id": task_id})
+
+    def apply_changes(self, tasks, deleted_ids):
+        self._append(*[{"op": "upsert", "task": task.to_dict()} for task in tasks],
+                     *[{"op": "delete", "id": task_id} for task_id in deleted_ids])
+
+    def _append(self, *records):
+        with open(self.journal_file, "a", encoding="utf-8") as f:
+            f.writelines(json.dumps(record, ensure_ascii=False) + "\n" for record in records)
+        # Kompaktierung sofort (Snapshot-Modus) oder sobald das Journal zu groß wird
+        if self.mode != "journal" or os.path.getsize(self.journal_file) >= JOURNAL_COMPACT_BYTES:
+            self.compact()
+
+    def compact(self):
+        self.save_all(self.load_all())
+
+    def load_tombstones(self):
+        return sorted((record["revision"], record["id"]) for record in read_journal_records(self.tombstone_file))
+
+    def save_tombstones(self, tombstones):
+        # Nur anhängen; Grabsteine werden nie kompaktiert, damit Replikate auch alte Löschungen erfahren
+        with open(self.tombstone_file, "a", encoding="utf-8") as f:
+            f.writelines(json.dumps({"id": task_id, "revision": revision}) + "\n" for revision, task_id in tombstones)
+
+class SqliteTaskStore(TaskStore):
+    # Normalisierte Tabellen (tasks, task_tags, task_notes) mit Indizes auf den Filter- und Sortierspalten
+    supports_queries = True
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS tasks (
+            id INTEGER PRIMARY KEY,
+            title TEXT NOT NULL,
+            description TEXT,
+            due_date TEXT,
+            priority TEXT,
+            status TEXT,
+            assigned_to TEXT,
+            created_at TEXT,
+            completed_at TEXT,
+            recurrence TEXT,
+            revision INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE TABLE IF NOT EXISTS task_tags (
+            task_id INTEGER NOT NULL REFERENCES tasks(id) ON DELETE CASCADE,
+            position INTEGER NOT NULL,
+            tag TEXT NOT NULL,
+            PRIMARY KEY (task_id, position)
+        );
+        CREATE TABLE IF NOT EXISTS task_notes (
+            task_id INTEGER NOT NULL REFERENCES tasks(id) ON DELETE CASCADE,
+            position INTEGER NOT NULL,
+            timestamp TEXT,
+            content TEXT,
+            PRIMARY KEY (task_id, position)
+        );
+        CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks(status);
+        CREATE INDEX IF NOT EXISTS idx_tasks_priority ON tasks(priority);
+        CREATE INDEX IF NOT EXISTS idx_tasks_assigned_to ON tasks(assigned_to);
+        CREATE INDEX IF NOT EXISTS idx_tasks_due_date ON tasks(due_date);
+        CREATE INDEX IF NOT EXISTS idx_tasks_created_at ON tasks(created_at);
+        CREATE INDEX IF NOT EXISTS idx_task_tags_tag ON task_tags(tag);
+    """
+    # Schema-Version 2: Revision je Aufgabe und Grabsteine gelöschter Aufgaben für den Delta-Export
+    TOMBSTONE_SCHEMA = """
+        CREATE TABLE IF NOT EXISTS tombstones (
+            revision INTEGER PRIMARY KEY,
+            task_id INTEGER NOT NULL
+        );
+    """
+
+    def __init__(self, db_file=SQLITE_FILE, import_file=DATA_FILE):
+        self.conn = sqlite3.connect(db_file, check_same_thread=False)
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        # Python-lower() statt SQLite-lower(), damit Umlaute genauso sortiert werden wie bisher
+        self.conn.create_function("py_lower", 1, lambda value: value.lower() if value else value, deterministic=True)
+        user_version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        if user_version == 0:
+            self.conn.executescript(self.SCHEMA + self.TOMBSTONE_SCHEMA)
+            # Einmalige Übernahme der bestehenden JSON-Daten
+            if import_file and os.path.exists(import_file):
+                self.save_all(JsonTaskStore(data_file=import_file).load_all())
+            self.conn.execute("PRAGMA user_version = 2")
+        elif user_version == 1:
+            self.conn.execute("ALTER TABLE tasks ADD COLUMN revision INTEGER NOT NULL DEFAULT 0")
+            self.conn.executescript(self.TOMBSTONE_SCHEMA)
+            self.conn.execute("PRAGMA user_version = 2")
+
+    def _insert(self, task):
+        self.conn.execute(
+            "INSERT INTO tasks (id, title, description, due_date, priority, status, assigned_to, created_at, completed_at, recurrence, revision) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (task.id, task.title, task.description,
+             task.due_date.isoformat() if isinstance(task.due_date, datetime.date) else task.due_date,
+             task.priority, task.status, task.assigned_to, task.created_at, task.completed_at,
+             json.dumps(task.recurrence) if task.recurrence else None, task.revision)
+        )
+        self.conn.executemany("INSERT INTO task_tags (task_id, position, tag) VALUES (?, ?, ?)",
+                              [(task.id, i, tag) for i, tag in enumerate(task.tags)])
+        self.conn.executemany("INSERT INTO task_notes (task_id, position, timestamp, content) VALUES (?, ?, ?, ?)",
+                              [(task.id, i, note.get("timestamp"), note.get("content")) for i, note in enumerate(task.notes)])
+
+    def _delete(self, task_id):
+        self.conn.execute("DELETE FROM task_tags WHERE task_id = ?", (task_id,))
+        self.conn.execute("DELETE FROM task_notes WHERE task_id = ?", (task_id,))
+        self.conn.execute("DELETE FROM tasks WHERE id = ?", (task_id,))
+
+    def save_all(self, tasks):
+        with self.conn:
+            self.conn.execute("DELETE FROM task_tags")
+            self.conn.execute("DELETE FROM task_notes")
+            self.conn.execute("DELETE FROM tasks")
+            for task in tasks:
+                self._insert(task)
+
+    def save_task(self, task):
+        with self.conn:
+            self._delete(task.id)
+            self._insert(task)
+
+    def save_tasks(self, tasks):
+        with self.conn:
+            for task in tasks:
+                self._delete(task.id)
+                self._insert(task)
+
+    def delete_task(self, task_id):
+        with self.conn:
+            self._delete(task_id)
+
+    def apply_changes(self, tasks, deleted_ids):
+        with self.conn:
+            for task in tasks:
+                self._delete(task.id)
+                self._insert(task)
+            for task_id in deleted_ids:
+                self._delete(task_id)
+
+    def load_tombstones(self):
+        return self.conn.execute("SELECT revision, task_id FROM tombstones ORDER BY revision").fetchall()
+
+    def save_tombstones(self, tombstones):
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO tombstones (revision, task_id) VALUES (?, ?)", tombstones)
+
+    def load_all(self):
+        return self._select_tasks("", [], "ORDER BY tasks.id")
+
+    def _select_tasks(self, where, params, order_by, offset=0, limit=None):
+        page = f"{where} {order_by} LIMIT ? OFFSET ?"
+        params = list(params) + [-1 if limit is None else limit, offset]
+        rows = self.conn.execute(
+            "SELECT id, title, description, due_date, priority, status, assigned_to, created_at, completed_at, recurrence, revision "
+            f"FROM tasks {page}", params
+        ).fetchall()
+        # Tags und Notizen nur für die ausgewählten Zeilen nachladen
+        tags = defaultdict(list)
+        for task_id, tag in self.conn.execute(
+                f"SELECT task_tags.task_id, task_tags.tag FROM task_tags JOIN (SELECT tasks.id FROM tasks {page}) AS page ON page.id = task_tags.task_id "
+                "ORDER BY task_tags.task_id, task_tags.position", params):
+            tags[task_id].append(tag)
+        notes = defaultdict(list)
+        for task_id, timestamp, content in self.conn.execute(
+                f"SELECT task_notes.task_id, task_notes.timestamp, task_notes.content FROM task_notes JOIN (SELECT tasks.id FROM tasks {page}) AS page ON page.id = task_notes.task_id "
+                "ORDER BY task_notes.task_id, task_notes.position", params):
+            notes[task_id].append({"timestamp": timestamp, "content": content})
+        return [
+            Task.from_dict({
+                "id": row[0], "title": row[1], "description": row[2], "due_date": row[3],
+                "priority": row[4], "status": row[5], "assigned_to": row[6],
+                "tags": tags.get(row[0], []), "notes": notes.get(row[0], []),
+                "created_at": row[7], "completed_at": row[8],
+                "recurrence": json.loads(row[9]) if row[9] else None,
+                "revision": row[10]
+            })
+            for row in rows
+        ]
+
+    def _filter_clause(self, filter_status, filter_priority, filter_assigned_to, filter_tag):
+        conditions, params = [], []
+        for column, value in (("status", filter_status), ("priority", filter_priority), ("assigned_to", filter_assigned_to)):
+            if value and value != "All":
+                conditions.append(f"tasks.{column} = ?")
+                params.append(value)
+        if filter_tag and filter_tag != "All":
+            conditions.append("tasks.id IN (SELECT task_id FROM task_tags WHERE tag = ?)")
+            params.append(filter_tag)
+        return ("WHERE " + " AND ".join(conditions) if conditions else ""), params
+
+    def query_tasks(self, filter_status=None, filter_priority=None, filter_assigned_to=None, filter_tag=None, sort_by="Due Date", sort_order="Ascending", offset=0, limit=None):
+        where, params = self._filter_clause(filter_status, filter_priority, filter_assigned_to, filter_tag)
+        direction = "DESC" if sort_order == "Descending" else "ASC"
+        sort_expressions = {
+            "Due Date": "COALESCE(tasks.due_date, '9999-12-31')",
+            "Priority": "CASE tasks.priority " + " ".join(f"WHEN '{k}' THEN {v}" for k, v in PRIORITY_ORDER.items()) + " ELSE 99 END",
+            "Status": "CASE tasks.status " + " ".join(f"WHEN '{k}' THEN {v}" for k, v in STATUS_ORDER.items()) + " ELSE 99 END",
+            "Created At": "tasks.created_at",
+            "Title": "py_lower(tasks.title)",
+        }
+        order_by = f"ORDER BY {sort_expressions[sort_by]} {direction}, tasks.id" if sort_by in sort_expressions else "ORDER BY tasks.id"
+        return self._select_tasks(where, params, order_by, offset, limit)
+
+    def count_tasks(self, filter_status=None, filter_priority=None, filter_assigned_to=None, filter_tag=None):
+        where, params = self._filter_clause(filter_status, filter_priority, filter_assigned_to, filter_tag)
+        return self.conn.execute(f"SELECT COUNT(*) FROM tasks {where}", params).fetchone()[0]
+
+def create_task_store():
+    if STORAGE_BACKEND == "sqlite":
+        return SqliteTaskStore()
+    return JsonTaskStore()
+
+# --- Prozessweiter Aufgabenbestand ---
+class InvertedIndex:
+    # Wert → Menge von Aufgaben-IDs. Die indizierten Werte werden pro Aufgabe gemerkt,
+    # damit eine Aufgabe auch nach einer Änderung an ihren Feldern sauber entfernt werden kann.
+    def __init__(self, values_func):
+        self.values_func = values_func
+        self.ids_by_value = {}
+        self.values_by_id = {}
+
+    def add(self, task):
+        values = tuple(dict.fromkeys(self.values_func(task))) # Duplikate (z.B. doppelte Tags) entfernen
+        self.values_by_id[task.id] = values
+        for value in values:
+            self.ids_by_value.setdefault(value, set()).add(task.id)
+
+    def discard(self, task_id):
+        for value in self.values_by_id.pop(task_id, ()):
+            ids = self.ids_by_value[value]
+            ids.discard(task_id)
+            if not ids:
+                del self.ids_by_value[value]
+
+    def clear(self):
+        self.ids_by_value = {}
+        self.values_by_id = {}
+
+    def get(self, value):
+        return self.ids_by_value.get(value, frozenset())
+
+    def values(self):
+        return list(self.ids_by_value)
+
+class SortedIndex:
+    # Nach Schlüssel sortierte (Schlüssel, ID)-Paare, per bisect aktuell gehalten.
+    # Liefert die ersten N Aufgaben in Sortierreihenfolge, ohne den Bestand neu zu sortieren.
+    def __init__(self, key_func):
+        self.key_func = key_func
+        self.entries = []
+        self.key_by_id = {}
+
+    def add(self, task):
+        key = self.key_func(task)
+        self.key_by_id[task.id] = key
+        bisect.insort(self.entries, (key, task.id))
+
+    def add_many(self, tasks):
+        # Für große Stapel (Start, Import): anhängen und einmal sortieren statt insort je Aufgabe
+        for task in tasks:
+            key = self.key_func(task)
+            self.key_by_id[task.id] = key
+            self.entries.append((key, task.id))
+        self.entries.sort()
+
+    def discard(self, task_id):
+        if task_id not in self.key_by_id:
+            return
+        entry = (self.key_by_id.pop(task_id), task_id)
+        del self.entries[bisect.bisect_left(self.entries, entry)]
+
+    def clear(self):
+        self.entries = []
+        self.key_by_id = {}
+
+    def range_ids(self, low=None, high=None):
+        # IDs mit low <= Schlüssel < high (None = offen)
+        start = 0 if low is None else bisect.bisect_left(self.entries, (low,))
+        end = len(self.entries) if high is None else bisect.bisect_left(self.entries, (high,))
+        return {task_id for _, task_id in self.entries[start:end]}
+
+    def ordered_ids(self, candidate_ids=None, descending=False, offset=0, limit=None):
+        stop = None if limit is None else offset + limit
+        if candidate_ids is not None and len(candidate_ids) * 8 < len(self.entries):
+            # Wenige Kandidaten: direkt über die gespeicherten Schlüssel sortieren statt den Index abzulaufen
+            sort_key = lambda task_id: (self.key_by_id[task_id], task_id)
+            if stop is None:
+                ordered = sorted(candidate_ids, key=sort_key, reverse=descending)
+            elif descending:
+                ordered = heapq.nlargest(stop, candidate_ids, key=sort_key)
+            else:
+                ordered = heapq.nsmallest(stop, candidate_ids, key=sort_key)
+            return ordered[offset:stop]
+        entries = reversed(self.entries) if descending else self.entries
+        ids = (task_id for _, task_id in entries if candidate_ids is None or task_id in candidate_ids)
+        return list(itertools.islice(ids, offset, stop))
+
+class DueDateCounters:
+    # Offene Aufgaben je Fälligkeitstag für "Überfällig" und "Fällig heute". Die Überfällig-Zahl wird als
+    # laufende Summe gehalten und beim Tageswechsel nur um die Buckets der vergangenen Tage weitergerollt.
+    def __init__(self, today=None):
+        self.today = today or datetime.date.today()
+        self.open_by_due_date = {}
+        self.due_date_by_id = {}
+        self.overdue = 0
+
+    def add(self, task):
+        if not task.due_date or task.status in ["Completed", "Cancelled"]:
+            return
+        self.due_date_by_id[task.id] = task.due_date
+        self.open_by_due_date[task.due_date] = self.open_by_due_date.get(task.due_date, 0) + 1
+        if task.due_date < self.today:
+            self.overdue += 1
+
+    def discard(self, task_id):
+        due_date = self.due_date_by_id.pop(task_id, None)
+        if due_date is None:
+            return
+        self.open_by_due_date[due_date] -= 1
+        if not self.open_by_due_date[due_date]:
+            del self.open_by_due_date[due_date]
+        if due_date < self.today:
+            self.overdue -= 1
+
+    def clear(self):
+        self.open_by_due_date = {}
+        self.due_date_by_id = {}
+        self.overdue = 0
+
+    def roll_to(self, today):
+        if today > self.today:
+            day = self.today
+            while day < today:
+                self.overdue += self.open_by_due_date.get(day, 0)
+                day += datetime.timedelta(days=1)
+        elif today < self.today: # Uhr zurückgestellt: einmal neu zählen
+            self.overdue = sum(count for due_date, count in self.open_by_due_date.items() if due_date < today)
+        self.today = today
+
+    def due_today(self):
+        return self.open_by_due_date.get(self.today, 0)
+
+def parse_timestamp(value):
+    # Zeitstempel mit Zeitzone (z.B. aus Importen) in lokale Zeit ohne Zeitzone umrechnen,
+    # wie sie datetime.now() liefert; sonst scheitern Differenzen an gemischten Werten
+    try:
+        parsed = datetime.datetime.fromisoformat(value) if value else None
+    except (TypeError, ValueError):
+        return None
+    if parsed is not None and parsed.tzinfo is not None:
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return parsed
+
+def lead_time(task):
+    # Zeit von der Erstellung bis zur Erledigung, nur für abgeschlossene Aufgaben mit beiden Zeitstempeln
+    if task.status != "Completed":
+        return None
+    created = parse_timestamp(task.created_at)
+    completed = parse_timestamp(task.completed_at)
+    return completed - created if created and completed else None
+
+class DailyRollups:
+    # Tageszeitreihen für die Berichte: erstellte und erledigte Aufgaben je Tag, Summe der Durchlaufzeiten
+    # je Erledigungstag sowie ein Histogramm der Durchlaufzeit in ganzen Tagen. Diagramme lesen damit
+    # O(Tage) Zeilen statt O(Aufgaben).
+    def __init__(self):
+        self.created_by_day = {}
+        self.completed_by_day = {}
+        self.lead_seconds_by_day = {}
+        self.lead_days_histogram = {}
+        self.entries_by_id = {}
+
+    @staticmethod
+    def _bump(counter, key, amount):
+        counter[key] = counter.get(key, 0) + amount
+        if not counter[key]:
+            del counter[key]
+
+    def add(self, task):
+        created = parse_timestamp(task.created_at)
+        completed = parse_timestamp(task.completed_at) if task.status == "Completed" else None
+        duration = lead_time(task)
+        entry = (
+            created.date() if created else None,
+            completed.date() if completed else None,
+            duration.total_seconds() if duration is not None else None,
+            duration.days if duration is not None else None,
+        )
+        self.entries_by_id[task.id] = entry
+        self._apply(entry, 1)
+
+    def discard(self, task_id):
+        entry = self.entries_by_id.pop(task_id, None)
+        if entry is not None:
+            self._apply(entry, -1)
+
+    def _apply(self, entry, sign):
+        created_day, completed_day, lead_seconds, lead_days = entry
+        if created_day:
+            self._bump(self.created_by_day, created_day, sign)
+        if completed_day:
+            self._bump(self.completed_by_day, completed_day, sign)
+        if lead_seconds is not None:
+            self._bump(self.lead_seconds_by_day, completed_day, sign * lead_seconds)
+            self._bump(self.lead_days_histogram, lead_days, sign)
+
+    def clear(self):
+        self.__init__()
+
+    def mean_lead_days(self):
+        # Mittelwert der ganzen Tage bis zur Erledigung (wie bisher .dt.days)
+        count = sum(self.lead_days_histogram.values())
+        if not count:
+            return float("nan")
+        return sum(days * n for days, n in self.lead_days_histogram.items()) / count
+
+class QuantileSketch:
+    # Log-Bucket-Sketch nach dem DDSketch-Prinzip: jedes Quantil mit höchstens alpha relativem Fehler.
+    # Sketches lassen sich durch Addieren der Bucket-Zähler mischen, Werte können auch wieder entfernt werden.
+    def __init__(self, alpha=0.01):
+        self.alpha = alpha
+        self.gamma = (1 + alpha) / (1 - alpha)
+        self.log_gamma = math.log(self.gamma)
+        self.buckets = {}
+        self.zero_count = 0
+        self.count = 0
+
+    def add(self, value, weight=1):
+        if value <= 1e-9:
+            self.zero_count += weight
+        else:
+            bucket = math.ceil(math.log(value) / self.log_gamma)
+            self.buckets[bucket] = self.buckets.get(bucket, 0) + weight
+            if not self.buckets[bucket]:
+                del self.buckets[bucket]
+        self.count += weight
+
+    def merge(self, other):
+        for bucket, weight in other.buckets.items():
+            self.buckets[bucket] = self.buckets.get(bucket, 0) + weight
+        self.zero_count += other.zero_count
+        self.count += other.count
+        return self
+
+    def quantiles(self, qs):
+        # Alle gewünschten Quantile in einem vektorisierten Durchlauf über die kumulierten Bucket-Zähler
+        qs = np.asarray(qs, dtype=float)
+        if self.count <= 0:
+            return np.full(len(qs), np.nan)
+        keys = np.array(sorted(self.buckets), dtype=float)
+        cumulative = self.zero_count + np.cumsum([self.buckets[int(k)] for k in keys])
+        ranks = qs * (self.count - 1)
+        positions = np.minimum(np.searchsorted(cumulative, ranks, side="right"), max(len(keys) - 1, 0))
+        values = 2 * np.power(self.gamma, keys[positions]) / (self.gamma + 1) if len(keys) else np.zeros(len(qs))
+        return np.where(ranks < self.zero_count, 0.0, values)
+
+class LeadTimeSketches:
+    # Durchlaufzeit (Stunden) erledigter Aufgaben als QuantileSketch je Zuständiger, Priorität und Tag
+    def __init__(self):
+        self.sketches = {}
+        self.entries_by_id = {}
+
+    def add(self, task):
+        duration = lead_time(task)
+        if duration is None:
+            return
+        hours = duration.total_seconds() / 3600
+        groups = [("assignee", task.assigned_to or "Niemand"), ("priority", task.priority)] + [("tag", tag) for tag in set(task.tags)]
+        self.entries_by_id[task.id] = (hours, groups)
+        for group in groups:
+            self.sketches.setdefault(group, QuantileSketch()).add(hours)
+
+    def discard(self, task_id):
+        hours, groups = self.entries_by_id.pop(task_id, (None, ()))
+        for group in groups:
+            sketch = self.sketches[group]
+            sketch.add(hours, -1)
+            if sketch.count <= 0:
+                del self.sketches[group]
+
+    def clear(self):
+        self.__init__()
+
+    def percentile_table(self, dimension, qs=(0.5, 0.9, 0.99)):
+        rows = []
+        for (group_dimension, value), sketch in self.sketches.items():
+            if group_dimension == dimension:
+                rows.append([value, sketch.count] + list(sketch.quantiles(qs) / 24))
+        return pd.DataFrame(rows, columns=["Gruppe", "Anzahl"] + [f"p{round(q * 100)} (Tage)" for q in qs]).sort_values("Anzahl", ascending=False)
+
+    def overall(self, qs=(0.5, 0.9, 0.99)):
+        # Gesamtwerte durch Mischen der Prioritäts-Sketches (jede erledigte Aufgabe hat genau eine Priorität)
+        merged = QuantileSketch()
+        for (group_dimension, _), sketch in self.sketches.items():
+            if group_dimension == "priority":
+                merged.merge(sketch)
+        return merged.count, merged.quantiles(qs) / 24
+
+def to_datetime64(value):
+    if isinstance(value, str):
+        value = parse_timestamp(value) # Gleiche Zeitzonen-Behandlung wie DailyRollups
+    if not value:
+        return np.datetime64("NaT", "us")
+    return np.datetime64(value.isoformat(), "us")
+
+class TaskTable:
+    # Spaltenorientierte Ablage der auswertungsrelevanten Felder als NumPy-Arrays: Priorität, Status und
+    # Zuständige als Kategorie-Codes (-1 = leer), Datumsfelder als datetime64. Gelöschte Zeilen werden
+    # wie in TaskRegistry mit der letzten Zeile überschrieben, so bleiben die Spalten lückenlos.
+    CATEGORY_COLUMNS = ("priority", "status", "assigned_to")
+    DATE_COLUMNS = ("due_date", "created_at", "completed_at")
+
+    def __init__(self, capacity=1024):
+        self.capacity = capacity
+        self.size = 0
+        self.row_by_id = {}
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        self.titles = np.empty(capacity, dtype=object)
+        self.codes = {name: np.full(capacity, -1, dtype=np.int32) for name in self.CATEGORY_COLUMNS}
+        self.dates = {name: np.full(capacity, np.datetime64("NaT", "us")) for name in self.DATE_COLUMNS}
+        self.categories = {name: [] for name in self.CATEGORY_COLUMNS}
+        self.category_codes = {name: {} for name in self.CATEGORY_COLUMNS}
+
+    def _code(self, column, value):
+        if not value:
+            return -1
+        codes = self.category_codes[column]
+        if value not in codes:
+            codes[value] = len(self.categories[column])
+            self.categories[column].append(value)
+        return codes[value]
+
+    def _grow(self):
+        extra = self.capacity
+        self.ids = np.concatenate([self.ids, np.zeros(extra, dtype=np.int64)])
+        self.titles = np.concatenate([self.titles, np.empty(extra, dtype=object)])
+        for name in self.CATEGORY_COLUMNS:
+            self.codes[name] = np.concatenate([self.codes[name], np.full(extra, -1, dtype=np.int32)])
+        for name in self.DATE_COLUMNS:
+            self.dates[name] = np.concatenate([self.dates[name], np.full(extra, np.datetime64("NaT", "us"))])
+        self.capacity += extra
+
+    def add(self, task):
+        if self.size == self.capacity:
+            self._grow()
+        row = self.size
+        self.size += 1
+        self.row_by_id[task.id] = row
+        self.ids[row] = task.id
+        self.titles[row] = task.title
+        for name in self.CATEGORY_COLUMNS:
+            self.codes[name][row] = self._code(name, getattr(task, name))
+        for name in self.DATE_COLUMNS:
+            self.dates[name][row] = to_datetime64(getattr(task, name))
+
+    def discard(self, task_id):
+        row = self.row_by_id.pop(task_id, None)
+        if row is None:
+            return
+        last = self.size - 1
+        if row != last:
+            self.ids[row] = self.ids[last]
+            self.titles[row] = self.titles[last]
+            for column in list(self.codes.values()) + list(self.dates.values()):
+                column[row] = column[last]
+            self.row_by_id[int(self.ids[row])] = row
+        self.titles[last] = None
+        self.size = last
+
+    def clear(self):
+        self.__init__(self.capacity)
+
+    def to_frame(self, rows=None):
+        # Ohne rows: DataFrame auf Sichten der Arrays (keine Kopie). Mit rows: nur diese Zeilen, z.B. für eine Listenansicht.
+        select = (lambda column: column[:self.size]) if rows is None else (lambda column: column[rows])
+        data = {"id": select(self.ids), "title": select(self.titles)}
+        for name in self.CATEGORY_COLUMNS:
+            data[name] = pd.Categorical.from_codes(select(self.codes[name]), categories=self.categories[name])
+        for name in self.DATE_COLUMNS:
+            data[name] = select(self.dates[name])
+        return pd.DataFrame(data, copy=False)
+
+    def rows_for(self, task_ids):
+        # Inzwischen gelöschte IDs werden übersprungen
+        return self.to_frame(np.fromiter((self.row_by_id[task_id] for task_id in task_ids if task_id in self.row_by_id), dtype=np.int64))
+
+# --- Volltextsuche ---
+UMLAUT_FOLDING = str.maketrans({"ä": "ae", "ö": "oe", "ü": "ue", "ß": "ss"})
+
+def normalize_search_text(text):
+    # Kleinschreibung, Umlaute wie in "Mueller" auflösen, übrige Akzente entfernen
+    text = unicodedata.normalize("NFC", text).lower().translate(UMLAUT_FOLDING)
+    return "".join(c for c in unicodedata.normalize("NFKD", text) if not unicodedata.combining(c))
+
+def tokenize(text):
+    return re.findall(r"\w+", normalize_search_text(text or ""))
+
+class TextIndex:
+    # Invertierter Index Token → {Aufgaben-ID: gewichtete Häufigkeit} über Titel, Beschreibung und Notizen.
+    # vocabulary ist sortiert, damit Suchbegriffe auch als Wortanfang (Präfix) gefunden werden.
+    TITLE_WEIGHT = 3.0
+
+    def __init__(self):
+        self.postings = {}
+        self.tokens_by_id = {}
+        self.vocabulary = []
+
+    def _index(self, task):
+        # Trägt die Aufgabe in die Postings ein und liefert die neu hinzugekommenen Tokens
+        weights = defaultdict(float)
+        for token in tokenize(task.title):
+            weights[token] += self.TITLE_WEIGHT
+        for token in tokenize(task.description):
+            weights[token] += 1.0
+        for note in task.notes:
+            for token in tokenize(note.get("content")):
+                weights[token] += 1.0
+        self.tokens_by_id[task.id] = tuple(weights)
+        new_tokens = []
+        for token, weight in weights.items():
+            posting = self.postings.get(token)
+            if posting is None:
+                posting = self.postings[token] = {}
+                new_tokens.append(token)
+            posting[task.id] = weight
+        return new_tokens
+
+    def add(self, task):
+        for token in self._index(task):
+            bisect.insort(self.vocabulary, token)
+
+    def add_many(self, tasks):
+        # Vokabular einmal sortieren statt insort je neuem Token
+        for task in tasks:
+            self.vocabulary.extend(self._index(task))
+        self.vocabulary.sort()
+
+    def discard(self, task_id):
+        for token in self.tokens_by_id.pop(task_id, ()):
+            posting = self.postings[token]
+            del posting[task_id]
+            if not posting:
+                del self.postings[token]
+                del self.vocabulary[bisect.bisect_left(self.vocabulary, token)]
+
+    def clear(self):
+        self.postings = {}
+        self.tokens_by_id = {}
+        self.vocabulary = []
+
+    def _matching_tokens(self, term):
+        # Direkter Indexzugriff ab der Bisect-Position: O(log n + Treffer) statt islice, das von vorn zählt
+        vocabulary = self.vocabulary
+        for position in range(bisect.bisect_left(vocabulary, term), len(vocabulary)):
+            token = vocabulary[position]
+            if not token.startswith(term):
+                break
+            yield token
+
+    def search(self, query):
+        # Alle Suchbegriffe müssen vorkommen (UND). Bewertung: Gewicht × IDF, reine Präfixtreffer zählen halb.
+        scores = None
+        task_count = max(1, len(self.tokens_by_id))
+        for term in tokenize(query):
+            term_scores = defaultdict(float)
+            for token in self._matching_tokens(term):
+                posting = self.postings[token]
+                idf = math.log(1 + task_count / len(posting))
+                factor = 1.0 if token == term else 0.5
+                for task_id, weight in posting.items():
+                    term_scores[task_id] += weight * idf * factor
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = {task_id: score + term_scores[task_id] for task_id, score in scores.items() if task_id in term_scores}
+            if not scores:
+                break
+        return dict(scores) if scores else {}
+
+# --- Wiederkehrende Aufgaben ---
+# Serieninformationen stehen im recurrence-Dict jeder Aufgabe: series_id, occurrence (0, 1, 2, ...)
+# und anchor (Fälligkeit von Termin 0). Termine werden immer vom Anker aus berechnet.
+def add_months(day, months):
+    # Auf das Monatsende begrenzen: 31.01. + 1 Monat = 28./29.02.
+    month_index = day.month - 1 + months
+    year, month = day.year + month_index // 12, month_index % 12 + 1
+    return datetime.date(year, month, min(day.day, calendar.monthrange(year, month)[1]))
+
+def occurrence_due_date(recurrence, occurrence):
+    # None für unbekannte Typen und Termine jenseits von date.max
+    anchor = datetime.date.fromisoformat(recurrence["anchor"])
+    steps = max(1, recurrence.get("interval", 1)) * occurrence
+    try:
+        if recurrence["type"] == "daily":
+            return anchor + datetime.timedelta(days=steps)
+        if recurrence["type"] == "weekly":
+            return anchor + datetime.timedelta(weeks=steps)
+        if recurrence["type"] == "monthly":
+            return add_months(anchor, steps)
+        if recurrence["type"] == "yearly":
+            return add_months(anchor, 12 * steps)
+    except (OverflowError, ValueError):
+        pass
+    return None
+
+MAX_DAYS_PER_STEP = {"daily": 1, "weekly": 7, "monthly": 31, "yearly": 366}
+
+def first_occurrence_from(recurrence, day):
+    # Untere Schätzung der ersten Terminnummer mit Fälligkeit ab day, über die längstmögliche Schrittweite
+    step_days = MAX_DAYS_PER_STEP[recurrence["type"]] * max(1, recurrence.get("interval", 1))
+    return max(0, (day - datetime.date.fromisoformat(recurrence["anchor"])).days // step_days)
+
+def occurrences_between(recurrence, after_occurrence, low, high):
+    # Termine nach after_occurrence mit Fälligkeit in [low, high]. Der Einstieg wird über die längstmögliche
+    # Schrittweite geschätzt und liegt daher nie hinter dem ersten passenden Termin.
+    if recurrence.get("type") not in MAX_DAYS_PER_STEP:
+        return
+    start = max(after_occurrence + 1, first_occurrence_from(recurrence, low))
+    for occurrence in range(start, start + RECURRENCE_MAX_STEPS):
+        due_date = occurrence_due_date(recurrence, occurrence)
+        if due_date is None or due_date > high:
+            return
+        if due_date >= low:
+            yield occurrence, due_date
+
+def series_id_of(task):
+    return task.recurrence.get("series_id") if isinstance(task.recurrence, dict) else None
+
+def start_recurrence_series(task):
+    # Neue Serie mit der Aufgabe als Termin 0; ohne Fälligkeit gibt es keinen Anker
+    if isinstance(task.recurrence, dict) and task.recurrence.get("interval", 1) < 1:
+        task.recurrence = None # Wie in Task.from_dict: kein gültiges Intervall, keine Wiederholung
+    elif isinstance(task.recurrence, dict) and task.due_date:
+        task.recurrence = {"type": task.recurrence["type"], "interval": task.recurrence.get("interval", 1),
+                           "series_id": uuid.uuid4().hex, "occurrence": 0, "anchor": task.due_date.isoformat()}
+
+def assign_legacy_series(tasks):
+    # Ältere Daten ohne series_id: gleichartige Aufgaben einmalig per Gruppierung (statt paarweisem Vergleich)
+    # zu Serien zusammenfassen, Termine nach Fälligkeit durchnummeriert
+    groups = defaultdict(list)
+    for task in tasks:
+        if isinstance(task.recurrence, dict) and task.due_date and series_id_of(task) is None:
+            groups[(task.title, task.description, task.recurrence.get("type"), task.recurrence.get("interval", 1))].append(task)
+    changed = []
+    for (_, _, recurrence_type, interval), members in groups.items():
+        members.sort(key=lambda task: task.due_date)
+        series_id = uuid.uuid4().hex
+        for occurrence, task in enumerate(members):
+            task.recurrence = {"type": recurrence_type, "interval": interval, "series_id": series_id,
+                               "occurrence": occurrence, "anchor": members[0].due_date.isoformat()}
+            changed.append(task)
+    return changed
+
+def materialize_recurring_tasks(state, today):
+    # Kern von generate_recurring_tasks ohne UI, auch vom Hintergrund-Scheduler genutzt.
+    # Unter dem Lock und dank der (Serie, Fälligkeit)-Prüfung wird jeder Termin genau einmal erzeugt.
+    with state.lock:
+        migrated = assign_legacy_series(state.tasks)
+        for task in migrated:
+            state.tasks.reindex(task)
+        new_tasks, adopted = plan_recurring_tasks(state.tasks, today, state.next_task_id)
+        for task in adopted:
+            # Vorgezogener Termin wird regulärer Termin und damit neuer Cursor der Serie
+            task.recurrence = {key: value for key, value in task.recurrence.items() if key != "materialized"}
+            state.tasks.reindex(task)
+        for task in new_tasks:
+            state.tasks.add(task)
+        state.next_task_id += len(new_tasks)
+        if migrated or adopted or new_tasks:
+            state.store.save_tasks(migrated + adopted + new_tasks) # Ein Schreibvorgang für den ganzen Lauf
+            state.mark_changed()
+    return new_tasks
+
+class RecurrenceIndex:
+    # (Serie, Fälligkeit) → Aufgaben-ID für die Duplikatprüfung in O(1), dazu die Aufgaben-IDs je Serie.
+    # occurrences enthält (Serie, Terminnummer), damit ein verschobener Termin nicht erneut auftaucht.
+    # cursors hält je Serie den letzten regulär erzeugten Termin; im Kalender vorgezogene Termine
+    # (recurrence["materialized"]) zählen nicht, sonst verschwänden die Termine davor.
+    def __init__(self):
+        self.by_occurrence = {}
+        self.occurrences = {}
+        self.members = {}
+        self.cursors = {}
+        self.keys_by_id = {}
+
+    def add(self, task):
+        series_id = series_id_of(task)
+        if series_id is None or not task.due_date:
+            return
+        key = (series_id, task.due_date)
+        occurrence_key = (series_id, task.recurrence.get("occurrence", 0))
+        regular = not task.recurrence.get("materialized")
+        self.by_occurrence[key] = task.id
+        self.occurrences[occurrence_key] = task.id
+        self.members.setdefault(series_id, set()).add(task.id)
+        if regular and occurrence_key[1] > self.cursors.get(series_id, -1):
+            self.cursors[series_id] = occurrence_key[1]
+        self.keys_by_id[task.id] = (key, occurrence_key, regular)
+
+    def discard(self, task_id):
+        key, occurrence_key, regular = self.keys_by_id.pop(task_id, (None, None, False))
+        if key is None:
+            return
+        series_id = key[0]
+        if self.by_occurrence.get(key) == task_id:
+            del self.by_occurrence[key]
+        if self.occurrences.get(occurrence_key) == task_id:
+            del self.occurrences[occurrence_key]
+        members = self.members[series_id]
+        members.discard(task_id)
+        if not members:
+            del self.members[series_id]
+        if regular and self.cursors.get(series_id) == occurrence_key[1]:
+            # Nur beim Entfernen des Cursor-Termins die übrigen Termine der Serie durchsehen
+            remaining = [self.keys_by_id[member_id][1][1] for member_id in members if self.keys_by_id[member_id][2]]
+            if remaining:
+                self.cursors[series_id] = max(remaining)
+            else:
+                del self.cursors[series_id]
+
+    def clear(self):
+        self.__init__()
+
+def new_occurrence_task(template, task_id, occurrence, due_date, materialized=False):
+    recurrence = dict(template.recurrence, occurrence=occurrence)
+    if materialized:
+        recurrence["materialized"] = True
+    return Task(
+        id=task_id,
+        title=template.title,
+        description=template.description,
+        due_date=due_date,
+        priority=template.priority,
+        status="To Do", # Neue Instanz ist "To Do"
+        assigned_to=template.assigned_to,
+        tags=template.tags,
+        notes=[], # Keine alten Notizen übernehmen
+        recurrence=recurrence
+    )
 
+def series_head(registry, series_id):
+    # Aufgabe am Cursor der Serie (Vorlage für weitere Termine) oder None
+    task_id = registry.recurrence_index.occurrences.get((series_id, registry.recurrence_index.cursors.get(series_id)))
+    return registry.get(task_id) if task_id is not None else None
+
+def virtual_occurrences(registry, low, high):
+    # Künftige Termine jeder Serie im Fenster [low, high], nur berechnet und nicht gespeichert.
+    # Abgebrochene Serien (Termin am Cursor "Cancelled") werden nicht fortgeschrieben.
+    for series_id, cursor in registry.recurrence_index.cursors.items():
+        head = series_head(registry, series_id)
+        if head is None or head.status == "Cancelled":
+            continue
+        for occurrence, due_date in occurrences_between(head.recurrence, cursor, low, high):
+            if (series_id, due_date) not in registry.recurrence_index.by_occurrence and (series_id, occurrence) not in registry.recurrence_index.occurrences:
+                yield head, occurrence, due_date
+
+def plan_recurring_tasks(registry, today, next_task_id):
+    # Für jede Serie, deren Termin am Cursor erledigt ist: alle verpassten Termine bis heute
+    # (höchstens RECURRENCE_CATCH_UP_LIMIT) plus den nächsten zukünftigen Termin erzeugen. Ist der nächste
+    # zukünftige Termin schon im Kalender angelegt und offen, wird er übernommen (adopted) statt neu erzeugt.
+    new_tasks = []
+    adopted = []
+    for series_id, cursor in registry.recurrence_index.cursors.items():
+        head = series_head(registry, series_id)
+        if head is None or head.status != "Completed" or head.recurrence.get("type") not in MAX_DAYS_PER_STEP:
+            continue
+        planned = []
+        # Termine, die ohnehin hinter den letzten RECURRENCE_CATCH_UP_LIMIT verpassten liegen, überspringen
+        occurrence = max(cursor,
+                         first_occurrence_from(head.recurrence, head.due_date) - 1,
+                         first_occurrence_from(head.recurrence, today) - RECURRENCE_CATCH_UP_LIMIT - 1)
+        for _ in range(RECURRENCE_MAX_STEPS):
+            occurrence += 1
+            due_date = occurrence_due_date(head.recurrence, occurrence)
+            if due_date is None:
+                break
+            existing_id = registry.recurrence_index.occurrences.get((series_id, occurrence))
+            if existing_id is not None:
+                existing = registry.get(existing_id)
+                if due_date > today and existing.status != "Completed":
+                    adopted.append(existing)
+                    break
+                continue
+            if due_date <= head.due_date or (series_id, due_date) in registry.recurrence_index.by_occurrence:
+                continue
+            planned.append((occurrence, due_date))
+            if due_date > today:
+                break
+        for occurrence, due_date in planned[-RECURRENCE_CATCH_UP_LIMIT:]:
+            new_tasks.append(new_occurrence_task(head, next_task_id, occurrence, due_date))
+            next_task_id += 1
+    return new_tasks, adopted
+
+# --- Duplikaterkennung ---
+def content_hash(task):
+    # Kanonischer Inhalt einer Aufgabe; Tags sortiert, damit die Reihenfolge keine Rolle spielt
+    due_date = task.due_date.isoformat() if isinstance(task.due_date, datetime.date) else task.due_date
+    # created_at kanonisch ("2025-06-01" = "2025-06-01T00:00:00", Zeitzonen wie in parse_timestamp), damit
+    # der Umweg über die timestamp-Spalte des Parquet-Exports den Hash nicht ändert
+    created = parse_timestamp(task.created_at)
+    created_at = created.isoformat() if created else task.created_at
+    canonical = json.dumps([task.title, task.description or "", due_date, task.assigned_to, sorted(task.tags), created_at],
+                           ensure_ascii=False, separators=(",", ":"))
+    return hashlib.blake2b(canonical.encode("utf-8"), digest_size=16).digest()
+
+def title_shingles(title):
+    text = " ".join(tokenize(title))
+    return {text[i:i + 3] for i in range(len(text) - 2)} or ({text} if text else set())
+
+class TitleLSH:
+    # MinHash-Signaturen über Zeichen-Trigramme der Titel, aufgeteilt in BANDS Bänder à ROWS Werte.
+    # Nur Titel, die in mindestens einem Band übereinstimmen, werden per Jaccard genau verglichen.
+    BANDS = 16
+    ROWS = 4
+    PRIME = 4294967291 # größte Primzahl unter 2**32
+
+    def __init__(self, threshold=IMPORT_NEAR_DUPLICATE_THRESHOLD):
+        self.threshold = threshold
+        rng = np.random.default_rng(20250605)
+        self.a = rng.integers(1, 2**31, self.BANDS * self.ROWS, dtype=np.uint64)[:, None]
+        self.b = rng.integers(0, 2**31, self.BANDS * self.ROWS, dtype=np.uint64)[:, None]
+        self.buckets = {}
+        self.shingles_by_id = {}
+
+    def _band_keys(self, shingles):
+        x = np.fromiter((zlib.crc32(shingle.encode("utf-8")) for shingle in shingles), dtype=np.uint64, count=len(shingles))
+        signature = ((self.a * x + self.b) % self.PRIME).min(axis=1)
+        return [(band, signature[band * self.ROWS:(band + 1) * self.ROWS].tobytes()) for band in range(self.BANDS)]
+
+    def add(self, task_id, title):
+        shingles = title_shingles(title)
+        if not shingles:
+            return
+        self.shingles_by_id[task_id] = shingles
+        for key in self._band_keys(shingles):
+            self.buckets.setdefault(key, []).append(task_id)
+
+    def find(self, title):
+        shingles = title_shingles(title)
+        if not shingles:
+            return None
+        checked = set()
+        for key in self._band_keys(shingles):
+            for task_id in self.buckets.get(key, ()):
+                if task_id in checked:
+                    continue
+                checked.add(task_id)
+                other = self.shingles_by_id[task_id]
+                if len(shingles & other) / len(shingles | other) >= self.threshold:
+                    return task_id
+        return None
+
+class TaskRegistry:
+    # Aufgabenliste plus id→Task und id→Position, damit Zugriffe über die ID O(1) kosten.
+    # Löschen vertauscht mit dem letzten Element (swap-remove), die Reihenfolge ist daher nicht stabil.
+    # Jede Änderung über add/reindex erhält eine neue Revision, jedes remove einen Grabstein (Revision, ID).
+    def __init__(self, tasks=(), tombstones=()):
+        self.tasks = []
+        self.by_id = {}
+        self.positions = {}
+        self.tombstones = list(tombstones)
+        # Sekundärindizes für die Filter in "Aufgaben verwalten"
+        self.status_index = InvertedIndex(lambda task: (task.status,))
+        self.priority_index = InvertedIndex(lambda task: (task.priority,))
+        self.assignee_index = InvertedIndex(lambda task: (task.assigned_to,) if task.assigned_to else ())
+        self.tag_index = InvertedIndex(lambda task: task.tags)
+        # Tages-Buckets für den Kalender: ein Monat kostet nur die Aufgaben dieses Monats
+        self.due_date_index = InvertedIndex(lambda task: (task.due_date,) if task.due_date else ())
+        # Inhalts-Hash → IDs für die Duplikatprüfung beim Import
+        self.content_index = InvertedIndex(lambda task: (content_hash(task),))
+        # Sortierte Indizes je Sortierschlüssel für "Aufgaben verwalten" und das Dashboard
+        self.sort_indexes = {name: SortedIndex(key_func) for name, key_func in TASK_SORT_KEYS.items()}
+        self.text_index = TextIndex()
+        self.due_counters = DueDateCounters()
+        # Spaltenorientierte Sicht für Berichte und Tabellenansichten
+        self.table = TaskTable()
+        self.rollups = DailyRollups()
+        self.lead_times = LeadTimeSketches()
+        self.recurrence_index = RecurrenceIndex()
+        self.revision_index = SortedIndex(lambda task: task.revision)
+        self.indexes = [self.status_index, self.priority_index, self.assignee_index, self.tag_index, self.due_date_index, self.content_index, self.text_index,
+                        self.due_counters, self.table, self.rollups, self.lead_times, self.recurrence_index,
+                        self.revision_index] + list(self.sort_indexes.values())
+        self.add_many(tasks, touch=False)
+        self.revision = max([task.revision for task in self.tasks] + [revision for revision, _ in self.tombstones] + [0])
+
+    def __iter__(self):
+        return iter(self.tasks)
+
+    def __len__(self):
+        return len(self.tasks)
+
+    def __contains__(self, task_id):
+        return task_id in self.by_id
+
+    def get(self, task_id):
+        return self.by_id.get(task_id)
+
+    def add(self, task, touch=True):
+        if task.id in self.positions:
+            self.tasks[self.positions[task.id]] = task
+        else:
+            self.positions[task.id] = len(self.tasks)
+            self.tasks.append(task)
+        self.by_id[task.id] = task
+        self.reindex(task, touch)
+
+    def add_many(self, tasks, touch=True):
+        # Wie add für viele Aufgaben; Indizes mit add_many (sortierte Listen) sortieren einmal am Ende
+        tasks = list({task.id: task for task in tasks}.values())
+        for task in tasks:
+            if task.id in self.positions:
+                self.tasks[self.positions[task.id]] = task
+                for index in self.indexes:
+                    index.discard(task.id)
+            else:
+                self.positions[task.id] = len(self.tasks)
+                self.tasks.append(task)
+            self.by_id[task.id] = task
+            if touch:
+                self.revision += 1
+                task.revision = self.revision
+        for index in self.indexes:
+            if hasattr(index, "add_many"):
+                index.add_many(tasks)
+            else:
+                for task in tasks:
+                    index.add(task)
+
+    def reindex(self, task, touch=True):
+        # Nach jeder Änderung an einer Aufgabe aufrufen, damit alle Indizes aktuell bleiben
+        if touch:
+            self.revision += 1
+            task.revision = self.revision
+        for index in self.indexes:
+            index.discard(task.id)
+            index.add(task)
+
+    def remove(self, task_id, tombstone=True):
+        position = self.positions.pop(task_id, None)
+        if position is None:
+            return None
+        if tombstone:
+            self.revision += 1
+            self.tombstones.append((self.revision, task_id))
+        task = self.by_id.pop(task_id)
+        for index in self.indexes:
+            index.discard(task_id)
+        last_task = self.tasks.pop()
+        if position < len(self.tasks):
+            self.tasks[position] = last_task
+            self.positions[last_task.id] = position
+        return task
+
+    def clear(self):
+        for task in self.tasks:
+            self.revision += 1
+            self.tombstones.append((self.revision, task.id))
+        self.tasks = []
+        self.by_id = {}
+        self.positions = {}
+        for index in self.indexes:
+            index.clear()
+
+    def changes_since(self, cursor):
+        # Änderungen mit Revision > cursor in Revisionsreihenfolge, O(Änderungen) über den Revisions-Index.
+        # Aufgaben ohne Revision (0, aus älteren Daten) gehören nur zu einem vollständigen Abgleich (cursor 0).
+        low = cursor + 1 if cursor > 0 else 0
+        entries = self.revision_index.entries
+        changes = [(revision, "upsert", task_id) for revision, task_id in entries[bisect.bisect_left(entries, (low,)):]]
+        changes += [(revision, "delete", task_id) for revision, task_id in self.tombstones[bisect.bisect_left(self.tombstones, (low,)):]]
+        changes.sort()
+        return changes
+
+    def ordered_ids(self, sort_by, candidate_ids=None, descending=False, offset=0, limit=None):
+        stop = None if limit is None else offset + limit
+        if sort_by not in self.sort_indexes:
+            ids = (task.id for task in self.tasks if candidate_ids is None or task.id in candidate_ids)
+            return list(itertools.islice(ids, offset, stop))
+        return self.sort_indexes[sort_by].ordered_ids(candidate_ids, descending, offset, limit)
+
+# --- Abfragesprache für Aufgabenfilter ---
+# Beispiel: prio>=High due<7d tag:Projekt -assignee:Max "server backup"
+#   feld:wert[,wert...]  Gleichheit (status, prio, assignee, tag; Groß-/Kleinschreibung egal)
+#   feld<wert, <=, >, >= Vergleich (prio, due, created); Datumswerte: today, 7d, -2w, 2025-06-30
+#   title:text           Teilstring im Titel
+#   is:overdue|recurring|open
+#   -...                 Negation, freie Wörter gehen in die Volltextsuche
+QUERY_FIELDS = {"status": "status", "prio": "priority", "priority": "priority", "assignee": "assignee",
+                "assigned": "assignee", "tag": "tag", "due": "due", "created": "created", "title": "title", "is": "is"}
+QUERY_TERM_PATTERN = re.compile(r'(-?)(?:([A-Za-z]+)(:|<=|>=|<|>|=))?((?:"[^"]*"|[^\s"])+)')
+NO_DUE_DATE = datetime.date(9999, 12, 31) # Sortierschlüssel für Aufgaben ohne Fälligkeitsdatum
+
+class QuerySyntaxError(ValueError):
+    pass
+
+def parse_query_date(value, today):
+    relative = re.fullmatch(r"([+-]?\d+)([dw])", value)
+    if value == "today":
+        return today
+    if relative:
+        amount = int(relative.group(1))
+        return today + (datetime.timedelta(days=amount) if relative.group(2) == "d" else datetime.timedelta(weeks=amount))
+    try:
+        return datetime.date.fromisoformat(value)
+    except ValueError:
+        raise QuerySyntaxError(f"Ungültiges Datum '{value}' (erlaubt: today, 7d, -2w, JJJJ-MM-TT)")
+
+def date_bounds(operator, day):
+    # Vergleich als halboffener Bereich [low, high) auf Tagesebene
+    next_day = day + datetime.timedelta(days=1)
+    return {"<": (None, day), "<=": (None, next_day), ">": (next_day, None), ">=": (day, None)}.get(operator, (day, next_day))
+
+class TaskQuery:
+    # Einmal kompilierter Filterplan. set_filters nutzen Indizes und werden als Mengen geschnitten
+    # (kleinste zuerst), predicates laufen für Felder ohne Index in einem einzigen gemeinsamen Durchlauf.
+    def __init__(self):
+        self.set_filters = [] # (negiert, Funktion registry → Menge von IDs)
+        self.predicates = []  # (negiert, Funktion task → bool)
+        self.text_terms = []
+        self.excluded_text_terms = []
+
+    def add_values_filter(self, index_name, values, negate=False):
+        wanted = {value.lower() for value in values}
+        def ids(registry):
+            index = getattr(registry, index_name)
+            result = set()
+            for key in index.values():
+                if key.lower() in wanted:
+                    result |= index.get(key)
+            return result
+        self.set_filters.append((negate, ids))
+
+    def matching_ids(self, registry):
+        # Liefert (IDs oder None für "alle"; Relevanzwerte der Volltextsuche oder None)
+        positive = [ids(registry) for negate, ids in self.set_filters if not negate]
+        scores = None
+        if self.text_terms:
+            scores = registry.text_index.search(" ".join(self.text_terms))
+            positive.append(set(scores))
+        candidates = None
+        if positive:
+            positive.sort(key=len)
+            candidates = set(positive[0])
+            for ids in positive[1:]:
+                if not candidates:
+                    break
+                candidates &= ids
+        excluded = set()
+        for negate, ids in self.set_filters:
+            if negate:
+                excluded |= ids(registry)
+        for term in self.excluded_text_terms:
+            excluded |= set(registry.text_index.search(term))
+        if excluded or self.predicates:
+            pool = candidates if candidates is not None else registry.by_id
+            candidates = {
+                task_id for task_id in pool
+                if task_id not in excluded
+                and all(predicate(registry.get(task_id)) != negate for negate, predicate in self.predicates)
+            }
+        if scores is not None:
+            scores = {task_id: score for task_id, score in scores.items() if task_id in candidates}
+        return candidates, scores
+
+def compile_task_query(text, today=None):
+    today = today or datetime.date.today()
+    query = TaskQuery()
+    for match in QUERY_TERM_PATTERN.finditer(text or ""):
+        negate, field, operator, value = match.group(1) == "-", match.group(2), match.group(3), match.group(4).replace('"', "")
+        if field is None:
+            (query.excluded_text_terms if negate else query.text_terms).append(value)
+            continue
+        field = QUERY_FIELDS.get(field.lower())
+        comparison = operator not in (":", "=")
+        if field is None:
+            raise QuerySyntaxError(f"Unbekanntes Feld '{match.group(2)}'")
+        if comparison and field not in ("priority", "due", "created"):
+            raise QuerySyntaxError(f"'{match.group(2)}' unterstützt nur ':' als Operator")
+        if not value:
+            raise QuerySyntaxError(f"Fehlender Wert für '{match.group(2)}'")
+
+        if field == "priority" and comparison:
+            level = next((order for name, order in PRIORITY_ORDER.items() if name.lower() == value.lower()), None)
+            if level is None:
+                raise QuerySyntaxError(f"Unbekannte Priorität '{value}'")
+            # Kleinere Ordnungszahl = höhere Priorität (Urgent = 0)
+            accepts = {"<": lambda o: o > level, "<=": lambda o: o >= level, ">": lambda o: o < level, ">=": lambda o: o <= level}[operator]
+            query.add_values_filter("priority_index", [name for name, order in PRIORITY_ORDER.items() if accepts(order)], negate)
+        elif field in ("status", "priority", "assignee", "tag"):
+            query.add_values_filter(f"{field}_index", value.split(","), negate)
+        elif field in ("due", "created"):
+            low, high = date_bounds(operator, parse_query_date(value.lower(), today))
+            if field == "due":
+                # Aufgaben ohne Fälligkeitsdatum liegen am Ende des Index und erfüllen keinen Vergleich
+                high = min(high, NO_DUE_DATE) if high else NO_DUE_DATE
+                query.set_filters.append((negate, lambda registry, low=low, high=high: registry.sort_indexes["Due Date"].range_ids(low, high)))
+            else:
+                low = low.isoformat() if low else None
+                high = high.isoformat() if high else None
+                query.set_filters.append((negate, lambda registry, low=low, high=high: registry.sort_indexes["Created At"].range_ids(low, high)))
+        elif field == "title":
+            needle = normalize_search_text(value)
+            query.predicates.append((negate, lambda task, needle=needle: needle in normalize_search_text(task.title)))
+        elif field == "is":
+            predicates = {
+                "overdue": lambda task: bool(task.due_date) and task.due_date < today and task.status not in ["Completed", "Cancelled"],
+                "recurring": lambda task: bool(task.recurrence),
+                "open": lambda task: task.status not in ["Completed", "Cancelled"],
+            }
+            if value.lower() not in predicates:
+                raise QuerySyntaxError(f"Unbekannter Wert 'is:{value}' (erlaubt: {', '.join(predicates)})")
+            query.predicates.append((negate, predicates[value.lower()]))
+    return query
+
+# --- Hintergrund-Scheduler ---
+def next_midnight(now):
+    return datetime.datetime.combine(now.date() + datetime.timedelta(days=1), datetime.time.min)
+
+class TaskScheduler:
+    # Zeitwarteschlange als Heap, abgearbeitet von einem Daemon-Thread, damit Streamlit-Reruns nie warten.
+    # Jeder Job ist höchstens einmal eingeplant (due), ältere Heap-Einträge werden beim Entnehmen übersprungen.
+    # next_run(now) liefert den Folgetermin eines Jobs oder None.
+    MAX_SLEEP_SECONDS = 300 # Regelmäßig aufwachen, falls die Systemuhr springt
+
+    def __init__(self):
+        self.jobs = {}
+        self.heap = []
+        self.due = {}
+        self.condition = threading.Condition()
+        self.stopped = False
+        self.thread = None
+
+    def register(self, name, func, next_run, run_now=False):
+        self.jobs[name] = (func, next_run)
+        now = datetime.datetime.now()
+        when = now if run_now else next_run(now)
+        if when is not None:
+            self.schedule(name, when)
+
+    def schedule(self, name, when):
+        with self.condition:
+            if name in self.due and self.due[name] <= when:
+                return
+            self.due[name] = when
+            heapq.heappush(self.heap, (when, name))
+            self.condition.notify()
+
+    def wake(self, name):
+        self.schedule(name, datetime.datetime.now())
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name="task-scheduler", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        with self.condition:
+            self.stopped = True
+            self.condition.notify()
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while not self.stopped:
+                    now = datetime.datetime.now()
+                    if self.heap and self.heap[0][0] <= now:
+                        break
+                    timeout = (self.heap[0][0] - now).total_seconds() if self.heap else self.MAX_SLEEP_SECONDS
+                    self.condition.wait(min(timeout, self.MAX_SLEEP_SECONDS))
+                if self.stopped:
+                    return
+                when, name = heapq.heappop(self.heap)
+                if self.due.get(name) != when:
+                    continue
+                del self.due[name]
+            func, next_run = self.jobs[name]
+            try:
+                func()
+            except Exception:
+                traceback.print_exc() # Ein fehlgeschlagener Lauf darf den Scheduler nicht beenden
+            follow_up = next_run(datetime.datetime.now())
+            if follow_up is not None:
+                self.schedule(name, follow_up)
+
+def roll_due_counters(state):
+    with state.lock:
+        state.tasks.due_counters.roll_to(datetime.date.today())
+
+# --- Cache für Berichte ---
+def estimate_size(value):
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, str):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(estimate_size(v) for v in value.values())
+    return sys.getsizeof(value)
+
+class ReportCache:
+    # LRU-Cache für Berichtsdaten, Schlüssel (Name, Datenversion). Einträge einer älteren Version
+    # werden beim Einfügen der neuen verworfen, darüber hinaus wird nach max_bytes verdrängt.
+    def __init__(self, max_bytes=REPORT_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict() # (name, version) → (Wert, Größe)
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+
+    def get_or_build(self, name, version, build):
+        key = (name, version)
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                return self.entries[key][0]
+        value = build()
+        size = estimate_size(value)
+        with self.lock:
+            for stale_key in [k for k in self.entries if k[0] == name and k[1] < version]:
+                self._evict(stale_key)
+            if key not in self.entries and size <= self.max_bytes:
+                self.entries[key] = (value, size)
+                self.total_bytes += size
+                while self.total_bytes > self.max_bytes:
+                    self._evict(next(iter(self.entries)))
+        return value
+
+    def _evict(self, key):
+        _, size = self.entries.pop(key)
+        self.total_bytes -= size
+
+class SharedTaskState:
+    # Eine Kopie der Aufgaben für alle Browser-Sessions. Schreibzugriffe laufen über
+    # lock und erhöhen version, damit Sessions abgeleitete Daten nur bei Änderungen neu berechnen.
+    def __init__(self, store):
+        self.store = store
+        self.lock = threading.RLock()
+        self.tasks = TaskRegistry(store.load_all(), store.load_tombstones())
+        self.persisted_tombstones = len(self.tasks.tombstones)
+        # Auch gelöschte IDs nicht wiederverwenden, sonst wären Grabsteine im Delta-Export mehrdeutig
+        self.next_task_id = max([t.id for t in self.tasks] + [task_id for _, task_id in self.tasks.tombstones] + [0]) + 1
+        self.version = 0
+        self.report_cache = ReportCache()
+        self.scheduler = TaskScheduler()
+
+    def mark_changed(self):
+        self.version += 1
+        # Neue Grabsteine (aus remove/clear) gemeinsam mit der Änderung speichern
+        if len(self.tasks.tombstones) > self.persisted_tombstones:
+            self.store.save_tombstones(self.tasks.tombstones[self.persisted_tombstones:])
+            self.persisted_tombstones = len(self.tasks.tombstones)
+
+@st.cache_resource(show_spinner=False)
+def get_shared_state():
+    # cache_resource sorgt für genau einen Zustand und damit genau einen Scheduler pro Prozess
+    state = SharedTaskState(create_task_store())
+    state.scheduler.register("recurrences", lambda: materialize_recurring_tasks(state, datetime.date.today()), next_midnight, run_now=True)
+    state.scheduler.register("due_rollover", lambda: roll_due_counters(state), next_midnight)
+    state.scheduler.start()
+    return state
+
+shared_state = get_shared_state()
+task_store = shared_state.store
+
+# --- Diagramm-Aufbereitung ---
+def lttb_indices(x, y, threshold):
+    # Largest-Triangle-Three-Buckets: behält die Punkte, die die Form der Kurve am stärksten prägen
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    selected = np.empty(threshold, dtype=int)
+    selected[0], selected[-1] = 0, n - 1
+    previous = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x, avg_y = x[end:next_end].mean(), y[end:next_end].mean()
+        areas = np.abs((x[previous] - avg_x) * (y[start:end] - y[previous]) - (x[previous] - x[start:end]) * (avg_y - y[previous]))
+        previous = start + int(np.argmax(areas))
+        selected[i + 1] = previous
+    return selected
+
+def collapse_categories(counts, label_column, value_column, max_categories=CHART_MAX_CATEGORIES):
+    # Nur die größten Kategorien einzeln zeigen, den Rest als "Sonstige" bündeln
+    if len(counts) <= max_categories:
+        return counts
+    counts = counts.sort_values(value_column, ascending=False, kind='stable')
+    head = counts.iloc[:max_categories - 1]
+    other = pd.DataFrame({label_column: ["Sonstige"], value_column: [counts[value_column].iloc[max_categories - 1:].sum()]})
+    return pd.concat([head, other], ignore_index=True)
+
+def time_series_chart_json(series, x, y, title):
+    # Lange Zeitreihen per LTTB ausdünnen und große Punktmengen mit WebGL rendern
+    if len(series) > CHART_MAX_POINTS:
+        positions = np.arange(len(series))
+        series = series.iloc[lttb_indices(positions, series[y].to_numpy(), CHART_MAX_POINTS)]
+    render_mode = 'webgl' if len(series) > CHART_WEBGL_THRESHOLD else 'auto'
+    return px.line(series, x=x, y=y, title=title, render_mode=render_mode).to_json()
+
+def build_dashboard_charts(task_summary):
+    charts = {"priority_pie": None, "status_bar": None}
+    priority_df = pd.DataFrame(task_summary["by_priority"].items(), columns=['Priority', 'Count'])
+    if not priority_df.empty:
+        charts["priority_pie"] = px.pie(priority_df, values='Count', names='Priority', title='Aufgabenverteilung nach Priorität').to_json()
+    status_df = pd.DataFrame(task_summary["by_status"].items(), columns=['Status', 'Count'])
+    if not status_df.empty:
+        charts["status_bar"] = px.bar(status_df, x='Status', y='Count', title='Aufgaben nach Status', color='Status').to_json()
+    return charts
+
+# --- Hilfsfunktionen für Datenhandling ---
 def save_tasks(tasks):
-    with open(DATA_FILE, "w", encoding="utf-8") as f:
-        json.dump([task.to_dict() for task in tasks], f, indent=4, ensure_ascii=False)
+    task_store.save_all(tasks)
+
+def persist_task(task):
+    task_store.save_task(task)
+
+def persist_deletion(task_id):
+    task_store.delete_task(task_id)
+
+def persist_changes(tasks, deleted_ids):
+    task_store.apply_changes(tasks, deleted_ids)
+
+class TaskImportError(ValueError):
+    pass
+
+def iter_json_array(stream, chunk_size=64 * 1024):
+    # Liefert die Elemente eines JSON-Arrays einzeln, ohne die ganze Datei in den Speicher zu laden
+    decoder = json.JSONDecoder()
+    buffer, pos, eof = "", 0, False
+
+    def read_more():
+        nonlocal buffer, pos, eof
+        chunk = stream.read(chunk_size)
+        buffer, pos = buffer[pos:] + chunk, 0
+        eof = not chunk
+
+    def skip_whitespace():
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos].isspace():
+                pos += 1
+            if pos < len(buffer) or eof:
+                return
+            read_more()
+
+    skip_whitespace()
+    if pos >= len(buffer) or buffer[pos] != "[":
+        raise TaskImportError("Die importierte JSON-Datei sollte eine Liste von Aufgabenobjekten enthalten.")
+    pos += 1
+    skip_whitespace()
+    if pos < len(buffer) and buffer[pos] == "]":
+        return
+    while True:
+        skip_whitespace()
+        while True:
+            # Ein Wert, der genau am Pufferende aufhört, könnte abgeschnitten sein (z.B. eine Zahl)
+            try:
+                value, end = decoder.raw_decode(buffer, pos)
+                if end < len(buffer) or eof:
+                    break
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            read_more()
+        pos = end
+        yield value
+        skip_whitespace()
+        if pos >= len(buffer):
+            raise json.JSONDecodeError("Unerwartetes Dateiende", buffer, pos)
+        if buffer[pos] == "]":
+            return
+        if buffer[pos] != ",":
+            raise json.JSONDecodeError("',' oder ']' erwartet", buffer, pos)
+        pos += 1
+
+def validate_import_batch(batch, offset):
+    # Vorläufige ID = Position im Import; die Eingabedaten selbst werden nicht verändert
+    tasks = []
+    for position, task_data in enumerate(batch, start=offset):
+        if not isinstance(task_data, dict) or not task_data.get("title"):
+            raise TaskImportError(f"Eintrag {position + 1} ist keine gültige Aufgabe (Titel fehlt).")
+        try:
+            tasks.append(Task.from_dict(dict(task_data, id=position)))
+        except (TypeError, ValueError, AttributeError) as e:
+            raise TaskImportError(f"Eintrag {position + 1} ist keine gültige Aufgabe: {e}")
+    return tasks
+
+def import_task_dicts(task_dicts, progress_fraction, on_progress=None, duplicate_mode="skip", near_duplicates=False):
+    # Gemeinsamer Importpfad: Einträge in Blöcken prüfen, am Ende einmal übernehmen
+    imported, batch = [], []
+    for task_data in task_dicts:
+        batch.append(task_data)
+        if len(batch) >= IMPORT_BATCH_SIZE:
+            imported.extend(validate_import_batch(batch, len(imported)))
+            batch = []
+            if on_progress:
+                on_progress(len(imported), progress_fraction())
+    imported.extend(validate_import_batch(batch, len(imported)))
+    return commit_imported_tasks(imported, duplicate_mode, near_duplicates)
+
+def import_tasks_from_json(stream, total_bytes, on_progress=None, duplicate_mode="skip", near_duplicates=False):
+    # Streaming-Import: Array elementweise lesen
+    text_stream = io.TextIOWrapper(stream, encoding="utf-8")
+    try:
+        return import_task_dicts(iter_json_array(text_stream), lambda: min(1.0, stream.tell() / max(total_bytes, 1)),
+                                 on_progress, duplicate_mode, near_duplicates)
+    finally:
+        text_stream.detach()
+
+def merge_imported_task(existing, incoming):
+    # Bearbeitungsstand aus der Datei übernehmen, Notizen vereinigen
+    existing.status = incoming.status
+    existing.priority = incoming.priority
+    existing.completed_at = incoming.completed_at
+    existing.recurrence = incoming.recurrence if incoming.recurrence else existing.recurrence
+    known_notes = {(note.get("timestamp"), note.get("content")) for note in existing.notes}
+    existing.notes = existing.notes + tuple(note for note in incoming.notes if (note.get("timestamp"), note.get("content")) not in known_notes)
+
+def commit_imported_tasks(tasks, duplicate_mode="skip", near_duplicates=False):
+    # Duplikate per Inhalts-Hash (O(1) je Aufgabe, auch innerhalb der Datei) überspringen oder zusammenführen,
+    # optional auch ähnliche Titel per MinHash/LSH. Neue Aufgaben erhalten IDs als ein Block ab next_task_id,
+    # danach eine Speicherung; schlägt Indizierung oder Speicherung fehl, wird alles zurückgenommen.
+    stats = {"imported": 0, "skipped": 0, "merged": 0}
+    with shared_state.lock:
+        registry = shared_state.tasks
+        title_lsh = None
+        if near_duplicates and duplicate_mode != "keep":
+            title_lsh = TitleLSH()
+            for task in registry:
+                title_lsh.add(task.id, task.title)
+        new_tasks, merged, seen_hashes = [], {}, {}
+        first_id = shared_state.next_task_id
+        try:
+            for task in tasks:
+                task_hash = content_hash(task)
+                duplicate_id = None
+                if duplicate_mode != "keep":
+                    duplicate_id = next(iter(registry.content_index.get(task_hash)), seen_hashes.get(task_hash))
+                    if duplicate_id is None and title_lsh is not None:
+                        duplicate_id = title_lsh.find(task.title)
+                if duplicate_id is None:
+                    task.id = first_id + len(new_tasks)
+                    new_tasks.append(task)
+                    seen_hashes[task_hash] = task.id
+                    if title_lsh is not None:
+                        title_lsh.add(task.id, task.title)
+                elif duplicate_mode == "merge" and duplicate_id in registry:
+                    existing = registry.get(duplicate_id)
+                    merged.setdefault(duplicate_id, existing.to_dict())
+                    merge_imported_task(existing, task)
+                    registry.reindex(existing)
+                    stats["merged"] += 1
+                else:
+                    stats["skipped"] += 1
+            # Serien der Datei, deren Termine hier schon existieren (z.B. eigener Export mit "Trotzdem importieren"),
+            # erhalten eine neue series_id; sonst teilten sich Original und Kopie (Serie, Termin) im RecurrenceIndex
+            occurrence_keys = set(registry.recurrence_index.occurrences)
+            colliding_series = set()
+            for task in new_tasks:
+                if series_id_of(task) is None:
+                    continue
+                occurrence_key = (series_id_of(task), task.recurrence.get("occurrence", 0))
+                if occurrence_key in occurrence_keys:
+                    colliding_series.add(occurrence_key[0])
+                occurrence_keys.add(occurrence_key)
+            fresh_series_ids = {series_id: uuid.uuid4().hex for series_id in colliding_series}
+            for task in new_tasks:
+                if series_id_of(task) in fresh_series_ids:
+                    task.recurrence = dict(task.recurrence, series_id=fresh_series_ids[series_id_of(task)])
+            assign_legacy_series(new_tasks) # Ältere Exporte ohne series_id gleich hier statt erst beim nächsten Lauf
+            registry.add_many(new_tasks)
+            shared_state.next_task_id += len(new_tasks)
+            if new_tasks or merged:
+                save_tasks(registry)
+        except Exception:
+            for task in new_tasks:
+                registry.remove(task.id, tombstone=False)
+            for task_data in merged.values():
+                registry.add(Task.from_dict(task_data), touch=False)
+            registry.revision = max([task.revision for task in registry] + [revision for revision, _ in registry.tombstones] + [0])
+            shared_state.next_task_id = first_id
+            raise
+        if new_tasks or merged:
+            shared_state.mark_changed()
+        stats["imported"] = len(new_tasks)
+    if any(task.recurrence for task in new_tasks):
+        shared_state.scheduler.wake("recurrences")
+    return stats
+
+EXPORT_FORMATS = {
+    "JSON": ("json", "application/json"),
+    "JSON Lines": ("jsonl", "application/x-ndjson"),
+    "CSV": ("csv", "text/csv"),
+    "Parquet (ZIP)": ("zip", "application/zip"),
+}
+CSV_EXPORT_COLUMNS = ["id", "title", "description", "due_date", "priority", "status", "assigned_to",
+                      "tags", "notes", "created_at", "completed_at", "recurrence", "revision"]
+
+def task_to_csv_row(task):
+    # Tags und Notizen flach als Text, Wiederholung als JSON
+    data = task.to_dict()
+    data["tags"] = "; ".join(task.tags)
+    data["notes"] = "\n".join(f"{note.get('timestamp', '')}: {note.get('content', '')}" for note in task.notes)
+    data["recurrence"] = json.dumps(task.recurrence, ensure_ascii=False) if task.recurrence else ""
+    return [data[column] for column in CSV_EXPORT_COLUMNS]
+
+def iter_export_chunks(tasks, export_format):
+    # Text in Blöcken zu je EXPORT_CHUNK_SIZE Aufgaben, nie die ganze Ausgabe auf einmal
+    task_iter = iter(tasks)
+    if export_format == "CSV":
+        buffer = io.StringIO()
+        csv.writer(buffer).writerow(CSV_EXPORT_COLUMNS)
+        yield buffer.getvalue()
+    elif export_format == "JSON":
+        yield "["
+    first_chunk = True
+    while True:
+        chunk = list(itertools.islice(task_iter, EXPORT_CHUNK_SIZE))
+        if not chunk:
+            break
+        if export_format == "CSV":
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(task_to_csv_row(task) for task in chunk)
+            yield buffer.getvalue()
+        elif export_format == "JSON Lines":
+            yield "".join(json.dumps(task.to_dict(), ensure_ascii=False) + "\n" for task in chunk)
+        else:
+            # Gleiches Format wie tasks.json, damit der Export wieder importiert werden kann
+            yield ("\n" if first_chunk else ",\n") + ",\n".join(json.dumps(task.to_dict(), indent=4, ensure_ascii=False) for task in chunk)
+        first_chunk = False
+    if export_format == "JSON":
+        yield "\n]\n"
+
+# --- Parquet/Arrow ---
+# Spalten wie in Task.to_dict/from_dict, mit Arrow-Typ und Umwandlung hin (to_dict → Arrow) und zurück.
+# Notizen stehen in einer eigenen Tabelle task_notes (task_id, position, timestamp, content).
+def parse_iso_date(value):
+    try:
+        return datetime.date.fromisoformat(value) if value else None
+    except (TypeError, ValueError):
+        return None
+
+def format_timestamp(value):
+    return value.isoformat() if value else None
+
+ARROW_TASK_FIELDS = {
+    "id": (pa.int64(), None, None),
+    "title": (pa.string(), None, None),
+    "description": (pa.string(), None, None),
+    "due_date": (pa.date32(), parse_iso_date, format_timestamp),
+    "priority": (pa.dictionary(pa.int32(), pa.string()), None, None),
+    "status": (pa.dictionary(pa.int32(), pa.string()), None, None),
+    "assigned_to": (pa.string(), None, None),
+    "tags": (pa.list_(pa.string()), None, None),
+    "created_at": (pa.timestamp("us"), parse_timestamp, format_timestamp),
+    "completed_at": (pa.timestamp("us"), parse_timestamp, format_timestamp),
+    "recurrence": (pa.string(), lambda value: json.dumps(value, ensure_ascii=False) if value else None, lambda value: json.loads(value) if value else None),
+    "revision": (pa.int64(), None, None),
+}
+TASKS_ARROW_SCHEMA = pa.schema([(name, arrow_type) for name, (arrow_type, _, _) in ARROW_TASK_FIELDS.items()])
+NOTES_ARROW_SCHEMA = pa.schema([("task_id", pa.int64()), ("position", pa.int32()), ("timestamp", pa.string()), ("content", pa.string())])
+
+def tasks_to_arrow(tasks):
+    rows = [task.to_dict() for task in tasks]
+    columns = []
+    for name, (arrow_type, to_arrow, _) in ARROW_TASK_FIELDS.items():
+        values = [row[name] if to_arrow is None else to_arrow(row[name]) for row in rows]
+        if pa.types.is_dictionary(arrow_type):
+            columns.append(pa.array(values, type=pa.string()).dictionary_encode())
+        else:
+            columns.append(pa.array(values, type=arrow_type))
+    notes = [(task.id, position, note.get("timestamp"), note.get("content")) for task in tasks for position, note in enumerate(task.notes)]
+    return (pa.Table.from_arrays(columns, schema=TASKS_ARROW_SCHEMA),
+            pa.Table.from_pylist([dict(zip(NOTES_ARROW_SCHEMA.names, note)) for note in notes], schema=NOTES_ARROW_SCHEMA))
+
+def write_parquet_archive(path, tasks):
+    # tasks.parquet und task_notes.parquet, je EXPORT_CHUNK_SIZE Aufgaben eine Row Group, gebündelt als ZIP
+    with tempfile.TemporaryDirectory() as directory:
+        tasks_path = os.path.join(directory, "tasks.parquet")
+        notes_path = os.path.join(directory, "task_notes.parquet")
+        with pq.ParquetWriter(tasks_path, TASKS_ARROW_SCHEMA) as tasks_writer, pq.ParquetWriter(notes_path, NOTES_ARROW_SCHEMA) as notes_writer:
+            task_iter = iter(tasks)
+            while True:
+                chunk = list(itertools.islice(task_iter, EXPORT_CHUNK_SIZE))
+                if not chunk:
+                    break
+                tasks_table, notes_table = tasks_to_arrow(chunk)
+                tasks_writer.write_table(tasks_table)
+                notes_writer.write_table(notes_table)
+        # Parquet ist bereits komprimiert, daher ohne ZIP-Kompression
+        with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_STORED) as archive:
+            archive.write(tasks_path, "tasks.parquet")
+            archive.write(notes_path, "task_notes.parquet")
+
+def iter_parquet_task_dicts(tasks_file, notes_by_task, progress):
+    # Row Groups einzeln lesen und in das Format von Task.to_dict zurückwandeln
+    for batch in tasks_file.iter_batches(batch_size=IMPORT_BATCH_SIZE):
+        for row in batch.to_pylist():
+            for name, (_, _, from_arrow) in ARROW_TASK_FIELDS.items():
+                if from_arrow is not None and name in row:
+                    row[name] = from_arrow(row[name])
+            row["notes"] = notes_by_task.get(row.get("id"), [])
+            yield row
+        progress[0] += batch.num_rows
+
+def import_tasks_from_parquet(stream, on_progress=None, duplicate_mode="skip", near_duplicates=False):
+    # ZIP aus dem Export (tasks.parquet + task_notes.parquet) oder eine einzelne Parquet-Datei ohne Notizen
+    notes_by_task = {}
+    archive = zipfile.ZipFile(stream) if zipfile.is_zipfile(stream) else None
+    stream.seek(0)
+    try:
+        if archive is not None:
+            if "tasks.parquet" not in archive.namelist():
+                raise TaskImportError("Das ZIP-Archiv enthält keine tasks.parquet.")
+            if "task_notes.parquet" in archive.namelist():
+                with archive.open("task_notes.parquet") as notes_file:
+                    for note in pq.read_table(notes_file).sort_by([("task_id", "ascending"), ("position", "ascending")]).to_pylist():
+                        notes_by_task.setdefault(note["task_id"], []).append({"timestamp": note["timestamp"], "content": note["content"]})
+            tasks_stream = archive.open("tasks.parquet")
+        else:
+            tasks_stream = stream
+        try:
+            tasks_file = pq.ParquetFile(tasks_stream)
+        except pa.ArrowInvalid:
+            raise TaskImportError("Die Datei ist keine gültige Parquet-Datei.")
+        total_rows = max(tasks_file.metadata.num_rows, 1)
+        progress = [0]
+        return import_task_dicts(iter_parquet_task_dicts(tasks_file, notes_by_task, progress), lambda: min(1.0, progress[0] / total_rows),
+                                 on_progress, duplicate_mode, near_duplicates)
+    finally:
+        if archive is not None:
+            archive.close()
+
+def write_export_file(export_format, compress):
+    # Export blockweise in eine temporäre Datei schreiben; erst auf Anforderung, nicht bei jedem Rerun
+    extension, mime = EXPORT_FORMATS[export_format]
+    if export_format == "Parquet (ZIP)":
+        fd, path = tempfile.mkstemp(prefix="tasks_export_", suffix=".zip")
+        os.close(fd)
+        with shared_state.lock:
+            write_parquet_archive(path, shared_state.tasks)
+        return path, "tasks_export.zip", mime
+    fd, path = tempfile.mkstemp(prefix="tasks_export_", suffix=f".{extension}" + (".gz" if compress else ""))
+    with open(fd, "wb") as raw_file:
+        out = gzip.GzipFile(fileobj=raw_file, mode="wb") if compress else raw_file
+        with shared_state.lock:
+            for chunk in iter_export_chunks(shared_state.tasks, export_format):
+                out.write(chunk.encode("utf-8"))
+        if compress:
+            out.close()
+    file_name = f"tasks_export.{extension}" + (".gz" if compress else "")
+    return path, file_name, "application/gzip" if compress else mime
+
+def write_delta_export(cursor):
+    # Änderungen seit cursor als JSON Lines im Format der Journal-Einträge (upsert/delete), ergänzt um die Revision.
+    # Die letzte Zeile enthält den Cursor für den nächsten Abgleich.
+    fd, path = tempfile.mkstemp(prefix="tasks_delta_", suffix=".jsonl")
+    with open(fd, "w", encoding="utf-8") as f, shared_state.lock:
+        registry = shared_state.tasks
+        for revision, operation, task_id in registry.changes_since(cursor):
+            if operation == "upsert":
+                record = {"op": "upsert", "revision": revision, "task": registry.get(task_id).to_dict()}
+            else:
+                record = {"op": "delete", "revision": revision, "id": task_id}
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        f.write(json.dumps({"op": "cursor", "revision": registry.revision}) + "\n")
+        current_revision = registry.revision
+    return path, f"tasks_delta_{cursor}_{current_revision}.jsonl", "application/x-ndjson"
+
+def discard_export_file():
+    # Vorbereitete Exportdatei entfernen: nach dem Download (on_click) oder vor einem neuen Export
+    export_file = st.session_state.pop("export_file", None)
+    if export_file and os.path.exists(export_file[0]):
+        os.remove(export_file[0])
+
+def remove_stale_export_files():
+    # Streamlit meldet kein Sessionende; Exporte verlassener Sessions daher nach Alter aufräumen
+    cutoff = datetime.datetime.now().timestamp() - EXPORT_FILE_MAX_AGE_SECONDS
+    for entry in os.scandir(tempfile.gettempdir()):
+        if entry.name.startswith(("tasks_export_", "tasks_delta_")) and entry.is_file():
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+            except OSError:
+                pass # Von einer anderen Session bereits entfernt
 
 # --- Initialisierung des Session State ---
-if "tasks" not in st.session_state:
-    st.session_state.tasks = load_tasks()
-if "next_task_id" not in st.session_state:
-    st.session_state.next_task_id = max([t.id for t in st.session_state.tasks] + [0]) + 1
 if "confirm_delete_completed" not in st.session_state:
     st.session_state.confirm_delete_completed = False
 if "confirm_delete_all" not in st.session_state: # NEU: Für "Alle Aufgaben löschen" Bestätigung
@@ -111,157 +2047,337 @@ if "page" not in st.session_state: # Initialize page state
 
 # --- Funktionen für Task-Management ---
 def add_task(title, description, due_date, priority, status, assigned_to, tags, recurrence):
-    new_task = Task(st.session_state.next_task_id, title, description, due_date, priority, status, assigned_to, tags, recurrence=recurrence)
-    st.session_state.tasks.append(new_task)
-    st.session_state.next_task_id += 1
-    save_tasks(st.session_state.tasks)
+    with shared_state.lock:
+        new_task = Task(shared_state.next_task_id, title, description, due_date, priority, status, assigned_to, tags, recurrence=recurrence)
+        start_recurrence_series(new_task)
+        shared_state.tasks.add(new_task)
+        shared_state.next_task_id += 1
+        persist_task(new_task)
+        shared_state.mark_changed()
     st.success("Aufgabe erfolgreich hinzugefügt!")
 
 def update_task(task_id, new_title, new_description, new_due_date, new_priority, new_status, new_assigned_to, new_tags, new_recurrence):
-    for i, task in enumerate(st.session_state.tasks):
-        if task.id == task_id:
-            st.session_state.tasks[i].title = new_title
-            st.session_state.tasks[i].description = new_description
-            st.session_state.tasks[i].due_date = new_due_date
-            st.session_state.tasks[i].priority = new_priority
-            st.session_state.tasks[i].status = new_status
-            st.session_state.tasks[i].assigned_to = new_assigned_to
-            st.session_state.tasks[i].tags = new_tags
-            st.session_state.tasks[i].recurrence = new_recurrence
-            if new_status == "Completed" and st.session_state.tasks[i].completed_at is None:
-                st.session_state.tasks[i].completed_at = datetime.datetime.now().isoformat()
-            elif new_status != "Completed" and st.session_state.tasks[i].completed_at is not None:
-                st.session_state.tasks[i].completed_at = None
-            save_tasks(st.session_state.tasks)
-            st.success(f"Aufgabe '{new_title}' erfolgreich aktualisiert!")
+    with shared_state.lock:
+        task = shared_state.tasks.get(task_id)
+        if task is None:
+            st.error("Aufgabe nicht gefunden.")
             return
-    st.error("Aufgabe nicht gefunden.")
+        # Serie beibehalten, solange die Wiederholungsregel gleich bleibt (ein verschobener Termin bleibt Teil der Serie)
+        keeps_series = (isinstance(task.recurrence, dict) and isinstance(new_recurrence, dict) and new_due_date
+                        and (task.recurrence.get("type"), task.recurrence.get("interval", 1)) == (new_recurrence["type"], new_recurrence.get("interval", 1)))
+        task.title = new_title
+        task.description = new_description
+        task.due_date = new_due_date
+        task.priority = intern_value(new_priority)
+        task.status = intern_value(new_status)
+        task.assigned_to = intern_value(new_assigned_to)
+        task.tags = tuple(intern_value(tag) for tag in new_tags)
+        if not keeps_series:
+            task.recurrence = new_recurrence
+            start_recurrence_series(task)
+        if new_status == "Completed" and task.completed_at is None:
+            task.completed_at = datetime.datetime.now().isoformat()
+        elif new_status != "Completed" and task.completed_at is not None:
+            task.completed_at = None
+        shared_state.tasks.reindex(task)
+        persist_task(task)
+        shared_state.mark_changed()
+    if task.recurrence and new_status == "Completed":
+        shared_state.scheduler.wake("recurrences")
+    st.success(f"Aufgabe '{new_title}' erfolgreich aktualisiert!")
 
 def delete_task(task_id):
-    st.session_state.tasks = [task for task in st.session_state.tasks if task.id != task_id]
-    save_tasks(st.session_state.tasks)
+    with shared_state.lock:
+        shared_state.tasks.remove(task_id)
+        persist_deletion(task_id)
+        shared_state.mark_changed()
     st.success("Aufgabe erfolgreich gelöscht!")
 
 def add_note_to_task(task_id, note_content):
-    for task in st.session_state.tasks:
-        if task.id == task_id:
-            task.notes.append({"timestamp": datetime.datetime.now().isoformat(), "content": note_content})
-            save_tasks(st.session_state.tasks)
-            st.success("Notiz hinzugefügt!")
+    with shared_state.lock:
+        task = shared_state.tasks.get(task_id)
+        if task is None:
+            st.error("Aufgabe nicht gefunden.")
             return
-    st.error("Aufgabe nicht gefunden.")
+        task.notes = task.notes + ({"timestamp": datetime.datetime.now().isoformat(), "content": note_content},)
+        shared_state.tasks.reindex(task)
+        persist_task(task)
+        shared_state.mark_changed()
+    st.success("Notiz hinzugefügt!")
 
 def mark_task_as_completed(task_id):
-    for i, task in enumerate(st.session_state.tasks):
-        if task.id == task_id:
-            if task.status != "Completed":
-                st.session_state.tasks[i].status = "Completed"
-                st.session_state.tasks[i].completed_at = datetime.datetime.now().isoformat()
-                save_tasks(st.session_state.tasks)
-                st.success(f"Aufgabe '{task.title}' als 'Erledigt' markiert! 🎉")
-            else:
-                st.info(f"Aufgabe '{task.title}' ist bereits als 'Erledigt' markiert.")
+    with shared_state.lock:
+        task = shared_state.tasks.get(task_id)
+        if task is None:
+            st.error("Aufgabe nicht gefunden.")
+            return
+        if task.status == "Completed":
+            st.info(f"Aufgabe '{task.title}' ist bereits als 'Erledigt' markiert.")
             return
-    st.error("Aufgabe nicht gefunden.")
+        task.status = "Completed"
+        task.completed_at = datetime.datetime.now().isoformat()
+        shared_state.tasks.reindex(task)
+        persist_task(task)
+        shared_state.mark_changed()
+    if task.recurrence:
+        shared_state.scheduler.wake("recurrences") # Nächsten Termin der Serie im Hintergrund erzeugen
+    st.success(f"Aufgabe '{task.title}' als 'Erledigt' markiert! 🎉")
+
+def materialize_occurrence(series_id, occurrence):
+    # Virtuellen Kalendertermin als echte Aufgabe anlegen, erst wenn er bearbeitet oder erledigt wird
+    with shared_state.lock:
+        head = series_head(shared_state.tasks, series_id)
+        if head is None:
+            st.error("Serie nicht gefunden.")
+            return None
+        existing_id = shared_state.tasks.recurrence_index.occurrences.get((series_id, occurrence))
+        if existing_id is not None:
+            return shared_state.tasks.get(existing_id)
+        # Als vorgezogen markiert: der Cursor der Serie bleibt stehen, frühere Termine bleiben sichtbar
+        task = new_occurrence_task(head, shared_state.next_task_id, occurrence, occurrence_due_date(head.recurrence, occurrence), materialized=True)
+        shared_state.tasks.add(task)
+        shared_state.next_task_id += 1
+        persist_task(task)
+        shared_state.mark_changed()
+        return task
+
+BULK_ACTIONS = {
+    "Erledigen": "complete",
+    "Zuweisen an": "assign",
+    "Priorität setzen": "priority",
+    "Status setzen": "status",
+    "Tag hinzufügen": "add_tag",
+    "Tag entfernen": "remove_tag",
+    "Löschen": "delete",
+}
+
+def apply_action_to_task(task, action, value):
+    if action in ("complete", "status"):
+        new_status = "Completed" if action == "complete" else value
+        task.status = intern_value(new_status)
+        if new_status == "Completed" and task.completed_at is None:
+            task.completed_at = datetime.datetime.now().isoformat()
+        elif new_status != "Completed":
+            task.completed_at = None
+    elif action == "assign":
+        task.assigned_to = intern_value(value) if value else None
+    elif action == "priority":
+        task.priority = intern_value(value)
+    elif action == "add_tag" and value not in task.tags:
+        task.tags = task.tags + (intern_value(value),)
+    elif action == "remove_tag":
+        task.tags = tuple(tag for tag in task.tags if tag != value)
+
+def apply_bulk_action(task_ids, action, value=None, label=""):
+    # Eine Sammelaktion als Batch gegen die Registry und mit genau einem Schreibvorgang.
+    # Rückgabe: Rückgängig-Information mit dem Zustand davor und der Revision danach je Aufgabe.
+    with shared_state.lock:
+        registry = shared_state.tasks
+        before, changed, deleted_ids = [], [], []
+        for task_id in task_ids:
+            task = registry.get(task_id)
+            if task is None:
+                continue
+            snapshot = task.to_dict()
+            if action == "delete":
+                registry.remove(task_id)
+                deleted_ids.append(task_id)
+                before.append(snapshot)
+                continue
+            apply_action_to_task(task, action, value)
+            if task.to_dict() != snapshot:
+                registry.reindex(task)
+                changed.append(task)
+                before.append(snapshot)
+        if changed or deleted_ids:
+            persist_changes(changed, deleted_ids)
+            shared_state.mark_changed()
+        after = {task.id: task.revision for task in changed}
+        after.update((task_id, None) for task_id in deleted_ids)
+    if any(task.recurrence and task.status == "Completed" for task in changed):
+        shared_state.scheduler.wake("recurrences")
+    return {"label": label, "count": len(before), "before": before, "after": after}
+
+def undo_bulk_action(undo):
+    # Nur Aufgaben zurücksetzen, die seit der Sammelaktion niemand anders geändert hat (Revision unverändert)
+    with shared_state.lock:
+        registry = shared_state.tasks
+        restored, skipped = [], 0
+        for task_data in undo["before"]:
+            current = registry.get(task_data["id"])
+            if (current.revision if current else None) != undo["after"][task_data["id"]]:
+                skipped += 1
+                continue
+            task = Task.from_dict(task_data)
+            registry.add(task)
+            restored.append(task)
+        if restored:
+            persist_changes(restored, ())
+            shared_state.mark_changed()
+    return len(restored), skipped
+
+def render_bulk_undo(key):
+    # Hinweis auf die letzte Sammelaktion dieser Session mit Rückgängig-Knopf
+    if st.session_state.get("bulk_undo_result"):
+        restored, skipped = st.session_state.pop("bulk_undo_result")
+        st.success(f"{restored} Aufgaben zurückgesetzt" + (f", {skipped} inzwischen anderweitig geändert und übersprungen." if skipped else "."))
+    undo = st.session_state.get("bulk_undo")
+    if not undo:
+        return
+    col_undo_info, col_undo_button = st.columns([4, 1])
+    col_undo_info.info(f"Letzte Sammelaktion: {undo['label']} ({undo['count']} Aufgaben)")
+    if col_undo_button.button("↩️ Rückgängig", key=key):
+        restored, skipped = undo_bulk_action(undo)
+        st.session_state.bulk_undo = None
+        st.session_state.bulk_undo_result = (restored, skipped)
+        st.rerun()
 
 def delete_completed_tasks():
-    tasks_before_delete = len(st.session_state.tasks)
-    st.session_state.tasks = [task for task in st.session_state.tasks if task.status != "Completed"]
-    tasks_after_delete = len(st.session_state.tasks)
-    deleted_count = tasks_before_delete - tasks_after_delete
-    save_tasks(st.session_state.tasks)
+    with shared_state.lock:
+        completed_ids = [task.id for task in shared_state.tasks if task.status == "Completed"]
+        for task_id in completed_ids:
+            shared_state.tasks.remove(task_id)
+        deleted_count = len(completed_ids)
+        save_tasks(shared_state.tasks)
+        shared_state.mark_changed()
     st.success(f"{deleted_count} erledigte Aufgaben erfolgreich gelöscht!")
     st.session_state.confirm_delete_completed = False # Reset confirmation
     st.rerun() # Reload UI
 
 def delete_all_tasks_confirmed():
-    st.session_state.tasks = []
-    st.session_state.next_task_id = 1
-    save_tasks(st.session_state.tasks)
+    with shared_state.lock:
+        shared_state.tasks.clear() # next_task_id bleibt, gelöschte IDs werden nicht wiederverwendet
+        save_tasks(shared_state.tasks)
+        shared_state.mark_changed()
     st.success("Alle Aufgaben wurden gelöscht.")
     st.session_state.confirm_delete_all = False # Reset confirmation
     st.rerun()
 
-def get_filtered_and_sorted_tasks(tasks, filter_status=None, filter_priority=None, filter_assigned_to=None, filter_tag=None, sort_by="Due Date", sort_order="Ascending"):
-    filtered_tasks = tasks
-    if filter_status and filter_status != "All":
-        filtered_tasks = [task for task in filtered_tasks if task.status == filter_status]
-    if filter_priority and filter_priority != "All":
-        filtered_tasks = [task for task in filtered_tasks if task.priority == filter_priority]
-    if filter_assigned_to and filter_assigned_to != "All":
-        filtered_tasks = [task for task in filtered_tasks if task.assigned_to == filter_assigned_to]
-    if filter_tag and filter_tag != "All":
-        filtered_tasks = [task for task in filtered_tasks if filter_tag in task.tags]
-
-    # Sortierung
-    if sort_by == "Due Date":
-        filtered_tasks.sort(key=lambda x: x.due_date if x.due_date else datetime.date(9999, 12, 31), reverse=(sort_order == "Descending"))
-    elif sort_by == "Priority":
-        priority_order = {"Urgent": 0, "High": 1, "Medium": 2, "Low": 3}
-        filtered_tasks.sort(key=lambda x: priority_order.get(x.priority, 99), reverse=(sort_order == "Descending"))
-    elif sort_by == "Status":
-        status_order = {"To Do": 0, "In Progress": 1, "On Hold": 2, "Completed": 3, "Cancelled": 4}
-        filtered_tasks.sort(key=lambda x: status_order.get(x.status, 99), reverse=(sort_order == "Descending"))
-    elif sort_by == "Created At":
-        filtered_tasks.sort(key=lambda x: x.created_at, reverse=(sort_order == "Descending"))
-    elif sort_by == "Title":
-        filtered_tasks.sort(key=lambda x: x.title.lower(), reverse=(sort_order == "Descending"))
-
-    return filtered_tasks
+def get_task_page(tasks, filter_status=None, filter_priority=None, filter_assigned_to=None, filter_tag=None, sort_by="Due Date", sort_order="Ascending", offset=0, limit=None, search_query=None):
+    # Liefert (Aufgaben ab offset, höchstens limit Stück; Gesamtzahl der Treffer).
+    # search_query ist ein Ausdruck der Abfragesprache; enthält er freie Wörter, wird nach Relevanz sortiert.
+    # Unter dem Lock: die gemeinsame SQLite-Verbindung und die Indizes sehen nie einen halb geschriebenen Stand
+    with shared_state.lock:
+        if task_store.supports_queries and not search_query:
+            # Filter, ORDER BY und LIMIT laufen in der Datenbank, nur Treffer werden als Task-Objekte erzeugt
+            page_tasks = task_store.query_tasks(filter_status, filter_priority, filter_assigned_to, filter_tag, sort_by, sort_order, offset, limit)
+            return page_tasks, task_store.count_tasks(filter_status, filter_priority, filter_assigned_to, filter_tag)
+
+        # Abfrage und Dropdown-Filter werden zu einem Plan kompiliert und über die Indizes ausgeführt
+        query = compile_task_query(search_query)
+        for index_name, value in (("status_index", filter_status), ("priority_index", filter_priority),
+                                  ("assignee_index", filter_assigned_to), ("tag_index", filter_tag)):
+            if value and value != "All":
+                query.add_values_filter(index_name, [value])
+        matching_ids, scores = query.matching_ids(tasks)
+        stop = None if limit is None else offset + limit
+
+        if scores is not None:
+            rank = lambda task_id: (-scores[task_id], task_id)
+            ranked_ids = sorted(scores, key=rank) if stop is None else heapq.nsmallest(stop, scores, key=rank)
+            return [tasks.get(task_id) for task_id in ranked_ids[offset:stop]], len(scores)
+
+        total = len(tasks) if matching_ids is None else len(matching_ids)
+        # Sortierung über die vorsortierten Indizes, nur die angefragte Seite wird materialisiert
+        page_ids = tasks.ordered_ids(sort_by, matching_ids, sort_order == "Descending", offset, limit)
+        return [tasks.get(task_id) for task_id in page_ids], total
+
+def get_task_summary(tasks):
+    # Alle Kennzahlen kommen aus den laufend gepflegten Indizes, Kosten unabhängig von der Aufgabenanzahl
+    with shared_state.lock:
+        tasks.due_counters.roll_to(datetime.date.today())
+        return {
+            "total": len(tasks),
+            "completed": len(tasks.status_index.get("Completed")),
+            "overdue": tasks.due_counters.overdue,
+            "due_today": tasks.due_counters.due_today(),
+            "by_priority": {priority: len(tasks.priority_index.get(priority)) for priority in tasks.priority_index.values()},
+            "by_status": {status: len(tasks.status_index.get(status)) for status in tasks.status_index.values()},
+        }
+
+def get_calendar_entries(tasks, start, end):
+    # Einträge je Tag im Fenster [start, end]: gespeicherte Aufgaben aus den Tages-Buckets plus virtuelle Serientermine
+    with shared_state.lock:
+        entries = {start + datetime.timedelta(days=offset): [] for offset in range((end - start).days + 1)}
+        for day, day_entries in entries.items():
+            for task_id in tasks.due_date_index.get(day):
+                task = tasks.get(task_id)
+                day_entries.append({"key": ("task", task.id), "title": task.title, "priority": task.priority,
+                                    "status": task.status, "task": task, "virtual": False})
+        for template, occurrence, due_date in virtual_occurrences(tasks, start, end):
+            entries[due_date].append({"key": ("virtual", template.recurrence["series_id"], occurrence), "title": template.title,
+                                      "priority": template.priority, "status": "To Do", "task": template, "virtual": True})
+        for day_entries in entries.values():
+            day_entries.sort(key=lambda entry: (PRIORITY_ORDER.get(entry["priority"], 99), entry["title"].lower()))
+        return entries
+
+def build_task_report(tasks):
+    # Alle Auswertungen für "Berichte & Analyse"; Diagramme als JSON, damit der Cache ihre Größe kennt.
+    # Die Daten kommen direkt aus der spaltenorientierten TaskTable, ohne Umweg über to_dict().
+    with shared_state.lock:
+        df_tasks = tasks.table.to_frame()
+        report = {}
+
+        status_counts = df_tasks['status'].value_counts()
+        status_counts = status_counts[status_counts > 0].reset_index()
+        status_counts.columns = ['Status', 'Anzahl']
+        report["status_pie"] = px.pie(status_counts, values='Anzahl', names='Status', title='Verteilung der Aufgaben nach Status').to_json()
+
+        priority_counts = df_tasks['priority'].value_counts()
+        priority_counts = priority_counts[priority_counts > 0].reset_index()
+        priority_counts.columns = ['Priorität', 'Anzahl']
+        # Sortiere nach der gewünschten Prioritätsreihenfolge
+        priority_order_list = ["Urgent", "High", "Medium", "Low"]
+        priority_counts['Priorität'] = pd.Categorical(priority_counts['Priorität'].astype(str), categories=priority_order_list, ordered=True)
+        priority_counts = priority_counts.sort_values('Priorität')
+        report["priority_bar"] = px.bar(priority_counts, x='Priorität', y='Anzahl', title='Anzahl der Aufgaben nach Priorität', color='Priorität').to_json()
+
+        # Zeitreihe und Erledigungszeiten aus den Tages-Rollups
+        daily_creations = pd.DataFrame(sorted(tasks.rollups.created_by_day.items()), columns=['Datum', 'Anzahl'])
+        daily_creations['Datum'] = daily_creations['Datum'].astype(str) # Für Plotly X-Achse
+        report["creation_line"] = time_series_chart_json(daily_creations, 'Datum', 'Anzahl', 'Anzahl der täglich erstellten Aufgaben')
+
+        report["avg_completion_days"] = None
+        report["completion_hist"] = None
+        if tasks.status_index.get("Completed"):
+            report["avg_completion_days"] = tasks.rollups.mean_lead_days()
+            lead_days = sorted(tasks.rollups.lead_days_histogram.items())
+            report["completion_hist"] = px.histogram(
+                x=[days for days, _ in lead_days], y=[count for _, count in lead_days], histfunc='sum', nbins=10,
+                labels={'x': 'time_to_complete'}, title='Verteilung der Erledigungszeiten (in Tagen)'
+            ).update_layout(yaxis_title='count').to_json()
+
+        # Perzentile der Durchlaufzeit aus den laufend gepflegten Sketches
+        report["lead_time_overall"] = tasks.lead_times.overall()
+        report["lead_time_tables"] = {
+            dimension: tasks.lead_times.percentile_table(dimension) for dimension in ("assignee", "priority", "tag")
+        }
+
+        assigned_to_counts = df_tasks['assigned_to'].value_counts()
+        assigned_to_counts = assigned_to_counts[assigned_to_counts > 0].reset_index()
+        assigned_to_counts.columns = ['Zugewiesen an', 'Anzahl']
+        assigned_to_counts['Zugewiesen an'] = assigned_to_counts['Zugewiesen an'].astype(str)
+        assigned_to_counts = collapse_categories(assigned_to_counts, 'Zugewiesen an', 'Anzahl')
+        report["assignee_bar"] = None
+        if not assigned_to_counts.empty:
+            report["assignee_bar"] = px.bar(assigned_to_counts, x='Zugewiesen an', y='Anzahl', title='Anzahl der Aufgaben pro zugewiesener Person', color='Zugewiesen an').to_json()
+
+        # Tag-Häufigkeiten direkt aus dem Tag-Index
+        tag_counts = pd.DataFrame([(tag, len(tasks.tag_index.get(tag))) for tag in tasks.tag_index.values()], columns=['Tag', 'Anzahl'])
+        report["tags_bar"] = None
+        if not tag_counts.empty:
+            tag_counts = tag_counts.sort_values('Anzahl', ascending=False, kind='stable')
+            tag_counts = collapse_categories(tag_counts, 'Tag', 'Anzahl')
+            report["tags_bar"] = px.bar(tag_counts, x='Tag', y='Anzahl', title='Anzahl der Aufgaben pro Tag', color='Tag').to_json()
+        return report
 
 def generate_recurring_tasks():
-    today = datetime.date.today()
-    for task in st.session_state.tasks:
-        if task.recurrence and task.status == "Completed" and task.due_date:
-            last_due_date = task.due_date
-            if task.recurrence['type'] == 'daily':
-                next_due_date = last_due_date + datetime.timedelta(days=task.recurrence.get('interval', 1))
-            elif task.recurrence['type'] == 'weekly':
-                next_due_date = last_due_date + datetime.timedelta(weeks=task.recurrence.get('interval', 1))
-            elif task.recurrence['type'] == 'monthly':
-                # Einfache Monats-Logik, kann komplexer werden (z.B. Monatsende)
-                try:
-                    next_month = last_due_date.month + task.recurrence.get('interval', 1)
-                    next_year = last_due_date.year + (next_month - 1) // 12
-                    next_month = (next_month - 1) % 12 + 1
-                    next_due_date = datetime.date(next_year, next_month, last_due_date.day)
-                except ValueError: # Tag gibt es im nächsten Monat nicht (z.g. 31. Feb)
-                    # Dies sollte den letzten Tag des Monats ergeben, wenn der ursprüngliche Tag ungültig ist
-                    temp_date = datetime.date(last_due_date.year, last_due_date.month, 1) + datetime.timedelta(days=32 * task.recurrence.get('interval', 1))
-                    next_due_date = datetime.date(temp_date.year, temp_date.month, 1) - datetime.timedelta(days=1)
-
-
-            elif task.recurrence['type'] == 'yearly':
-                next_due_date = datetime.date(last_due_date.year + task.recurrence.get('interval', 1), last_due_date.month, last_due_date.day)
-            else:
-                next_due_date = None
-
-            if next_due_date and next_due_date > today:
-                # Prüfen, ob die Aufgabe bereits generiert wurde
-                existing_next_task = any(
-                    t.title == task.title and
-                    t.description == task.description and
-                    t.due_date == next_due_date and
-                    t.status != "Completed" # Vermeiden, abgeschlossene Aufgaben erneut zu erstellen
-                    for t in st.session_state.tasks
-                )
-                if not existing_next_task:
-                    new_recurring_task = Task(
-                        id=st.session_state.next_task_id,
-                        title=task.title,
-                        description=task.description,
-                        due_date=next_due_date,
-                        priority=task.priority,
-                        status="To Do", # Neue Instanz ist "To Do"
-                        assigned_to=task.assigned_to,
-                        tags=task.tags,
-                        notes=[], # Keine alten Notizen übernehmen
-                        recurrence=task.recurrence # Rekurrenz beibehalten
-                    )
-                    st.session_state.tasks.append(new_recurring_task)
-                    st.session_state.next_task_id += 1
-                    st.success(f"Wiederkehrende Aufgabe '{task.title}' für {next_due_date.isoformat()} generiert.")
-                    save_tasks(st.session_state.tasks) # Sofort speichern
+    new_tasks = materialize_recurring_tasks(shared_state, datetime.date.today())
+    if not new_tasks:
+        st.info("Keine neuen wiederkehrenden Aufgaben fällig.")
+    for task in new_tasks:
+        st.success(f"Wiederkehrende Aufgabe '{task.title}' für {task.due_date.isoformat()} generiert.")
+    return new_tasks
 
 # --- Streamlit UI ---
 st.set_page_config(layout="wide", page_title="Task Manager")
@@ -486,6 +2602,8 @@ if st.sidebar.button("Dashboard", key="nav_dashboard"):
     st.session_state.page = "Dashboard"
 if st.sidebar.button("Aufgaben verwalten", key="nav_manage_tasks"):
     st.session_state.page = "Aufgaben verwalten"
+if st.sidebar.button("Kalender", key="nav_calendar"):
+    st.session_state.page = "Kalender"
 if st.sidebar.button("Berichte & Analyse", key="nav_reports_analysis"):
     st.session_state.page = "Berichte & Analyse"
 if st.sidebar.button("Einstellungen", key="nav_settings"):
@@ -497,10 +2615,18 @@ if st.session_state.page == "Dashboard":
 
     # Schnell-Statistiken
     col1, col2, col3, col4 = st.columns(4)
-    total_tasks = len(st.session_state.tasks)
-    completed_tasks = len([t for t in st.session_state.tasks if t.status == "Completed"])
-    overdue_tasks = len([t for t in st.session_state.tasks if t.due_date and t.due_date < datetime.date.today() and t.status not in ["Completed", "Cancelled"]])
-    today_due_tasks = len([t for t in st.session_state.tasks if t.due_date == datetime.date.today() and t.status not in ["Completed", "Cancelled"]])
+    # Kennzahlen, Datenversion und aktuelle Aufgaben gemeinsam unter dem Lock lesen: die Diagramme cachen so
+    # nie alte Zahlen unter einer neuen Version, und der Scheduler ändert die Indizes nicht während des Lesens
+    with shared_state.lock:
+        task_summary = get_task_summary(shared_state.tasks)
+        summary_version = shared_state.version
+        # Nach Fälligkeitsdatum und Priorität sortiert, direkt aus dem sortierten Index
+        current_ids = shared_state.tasks.status_index.get("To Do") | shared_state.tasks.status_index.get("In Progress")
+        current_tasks = [shared_state.tasks.get(task_id) for task_id in shared_state.tasks.ordered_ids("Due Date, Priority", current_ids)]
+    total_tasks = task_summary["total"]
+    completed_tasks = task_summary["completed"]
+    overdue_tasks = task_summary["overdue"]
+    today_due_tasks = task_summary["due_today"]
 
     with col1:
         st.metric(label="Gesamtaufgaben", value=total_tasks)
@@ -512,14 +2638,23 @@ if st.session_state.page == "Dashboard":
         st.metric(label="Fällig heute", value=today_due_tasks)
 
     st.subheader("Aktuelle Aufgaben (To Do & In Progress)")
-    current_tasks = [t for t in st.session_state.tasks if t.status in ["To Do", "In Progress"]]
+    # Auch wenn die Sammelaktion die Liste geleert hat, bleibt sie rückgängig zu machen
+    render_bulk_undo("dashboard_bulk_undo")
 
     if current_tasks:
+        # Mehrere Aufgaben auf einmal erledigen: ein Batch, ein Schreibvorgang, ein Rerun
+        current_titles = {task.id: task.title for task in current_tasks}
+        col_bulk_select, col_bulk_button = st.columns([4, 1])
+        with col_bulk_select:
+            bulk_complete_ids = st.multiselect("Mehrere Aufgaben auswählen", list(current_titles),
+                                               format_func=lambda task_id: f"#{task_id} – {current_titles[task_id]}", key="dashboard_bulk_ids")
+        with col_bulk_button:
+            if st.button("✅ Ausgewählte erledigen", disabled=not bulk_complete_ids):
+                st.session_state.bulk_undo = apply_bulk_action(bulk_complete_ids, "complete", label="Erledigen")
+                del st.session_state["dashboard_bulk_ids"]
+                st.rerun()
+
         st.write("Wähle eine Aufgabe zum Erledigen:")
-        
-        # Sortiere Aufgaben, z.B. nach Fälligkeitsdatum und Priorität
-        current_tasks.sort(key=lambda x: (x.due_date if x.due_date else datetime.date(9999,12,31), 
-                                          {"Urgent":0, "High":1, "Medium":2, "Low":3}.get(x.priority, 99)))
 
         headers = ["Titel", "Fällig", "Priorität", "Status", "Aktion"]
         cols_widths = [4, 2, 1, 1, 1.5] # Anpassbare Spaltenbreiten
@@ -549,25 +2684,18 @@ if st.session_state.page == "Dashboard":
     else:
         st.info("Keine aktuellen Aufgaben vorhanden, die erledigt werden können.")
 
+    # Diagramm-JSON pro Datenstand zwischenspeichern statt die Figuren bei jedem Rerun neu zu bauen
+    dashboard_charts = shared_state.report_cache.get_or_build("dashboard_charts", summary_version, lambda: build_dashboard_charts(task_summary))
+
     st.subheader("Aufgaben nach Priorität")
-    priority_counts = defaultdict(int)
-    for task in st.session_state.tasks:
-        priority_counts[task.priority] += 1
-    priority_df = pd.DataFrame(priority_counts.items(), columns=['Priority', 'Count'])
-    if not priority_df.empty:
-        fig_priority = px.pie(priority_df, values='Count', names='Priority', title='Aufgabenverteilung nach Priorität')
-        st.plotly_chart(fig_priority, use_container_width=True)
+    if dashboard_charts["priority_pie"]:
+        st.plotly_chart(pio.from_json(dashboard_charts["priority_pie"]), use_container_width=True)
     else:
         st.info("Keine Aufgaben zur Anzeige der Prioritätsverteilung.")
 
     st.subheader("Aufgaben nach Status")
-    status_counts = defaultdict(int)
-    for task in st.session_state.tasks:
-        status_counts[task.status] += 1
-    status_df = pd.DataFrame(status_counts.items(), columns=['Status', 'Count'])
-    if not status_df.empty:
-        fig_status = px.bar(status_df, x='Status', y='Count', title='Aufgaben nach Status', color='Status')
-        st.plotly_chart(fig_status, use_container_width=True)
+    if dashboard_charts["status_bar"]:
+        st.plotly_chart(pio.from_json(dashboard_charts["status_bar"]), use_container_width=True)
     else:
         st.info("Keine Aufgaben zur Anzeige der Statusverteilung.")
 
@@ -616,10 +2744,12 @@ elif st.session_state.page == "Aufgaben verwalten":
     st.subheader("Aufgabenliste")
     col_filter_1, col_filter_2, col_filter_3 = st.columns(3)
     
-    all_statuses = ["All"] + list(set(t.status for t in st.session_state.tasks))
+    # Filteroptionen direkt aus den Indexschlüsseln, ohne Durchlauf über alle Aufgaben
+    with shared_state.lock:
+        all_statuses = ["All"] + shared_state.tasks.status_index.values()
+        all_assignees = ["All"] + shared_state.tasks.assignee_index.values()
+        all_tags = ["All"] + shared_state.tasks.tag_index.values()
     all_priorities = ["All", "Urgent", "High", "Medium", "Low"]
-    all_assignees = ["All"] + list(set(t.assigned_to for t in st.session_state.tasks if t.assigned_to))
-    all_tags = ["All"] + list(set(tag for t in st.session_state.tasks for tag in t.tags))
 
     with col_filter_1:
         filter_status = st.selectbox("Filter nach Status", all_statuses)
@@ -631,20 +2761,83 @@ elif st.session_state.page == "Aufgaben verwalten":
         sort_by = st.selectbox("Sortieren nach", ["Due Date", "Priority", "Status", "Created At", "Title"])
         sort_order = st.radio("Sortierreihenfolge", ["Ascending", "Descending"], horizontal=True)
 
-    filtered_and_sorted_tasks = get_filtered_and_sorted_tasks(
-        st.session_state.tasks,
-        filter_status,
-        filter_priority,
-        filter_assigned_to,
-        filter_tag,
-        sort_by,
-        sort_order
+    search_query = st.text_input(
+        "Suche / Abfrage",
+        placeholder='z.B. prio>=High due<7d tag:Projekt -assignee:Max "server backup"',
+        help="Freie Wörter durchsuchen Titel, Beschreibung und Notizen. Felder: status:, prio:, assignee:, tag:, title:, "
+             "is:overdue|recurring|open, Vergleiche wie prio>=High, due<7d, created>=-2w, due<=2025-06-30. '-' verneint einen Ausdruck. "
+             "Mit freien Wörtern wird nach Relevanz statt nach der gewählten Sortierung geordnet."
     )
 
+    col_page_1, col_page_2 = st.columns(2)
+    with col_page_1:
+        page_size = st.selectbox("Aufgaben pro Seite", [10, 25, 50, 100], index=1)
+    with col_page_2:
+        page_number = st.number_input("Seite", min_value=1, value=1, step=1)
+
+    # Nur die angezeigte Seite wird aus den sortierten Indizes geholt
+    try:
+        filtered_and_sorted_tasks, total_filtered = get_task_page(
+            shared_state.tasks,
+            filter_status,
+            filter_priority,
+            filter_assigned_to,
+            filter_tag,
+            sort_by,
+            sort_order,
+            offset=(page_number - 1) * page_size,
+            limit=page_size,
+            search_query=search_query
+        )
+    except QuerySyntaxError as e:
+        st.error(f"Fehler in der Abfrage: {e}")
+        filtered_and_sorted_tasks, total_filtered = [], 0
+    st.caption(f"Seite {page_number} von {max(1, -(-total_filtered // page_size))} ({total_filtered} Aufgaben)")
+    render_bulk_undo("manage_bulk_undo") # Außerhalb der Liste, die nach der Sammelaktion leer sein kann
+
     if filtered_and_sorted_tasks:
-        # Anzeigen der Aufgaben in erweiterbaren Abschnitten
-        for task in filtered_and_sorted_tasks:
-            with st.expander(f"**{task.title}** (Fällig: {task.due_date.isoformat() if task.due_date else 'N/A'}) - Status: {task.status} - Priorität: {task.priority}"):
+        # Nur eine kompakte Tabelle für die aktuelle Seite. Details, Notizen und das Bearbeitungsformular
+        # werden ausschließlich für die ausgewählte Aufgabe aufgebaut, die Widget-Anzahl bleibt so konstant.
+        page_tasks_by_id = {task.id: task for task in filtered_and_sorted_tasks}
+        # Zeilen der Seite direkt aus der spaltenorientierten TaskTable
+        with shared_state.lock:
+            page_frame = shared_state.tasks.table.rows_for(list(page_tasks_by_id))[["id", "title", "due_date", "status", "priority", "assigned_to"]]
+        page_frame.columns = ["ID", "Titel", "Fällig", "Status", "Priorität", "Zugewiesen an"]
+        page_frame["Fällig"] = page_frame["Fällig"].dt.date
+        st.dataframe(page_frame, hide_index=True, use_container_width=True)
+
+        # Sammelaktionen für ausgewählte Aufgaben der Seite
+        with st.expander("Mehrfachbearbeitung"):
+            select_whole_page = st.checkbox("Alle Aufgaben dieser Seite auswählen")
+            bulk_ids = list(page_tasks_by_id) if select_whole_page else st.multiselect(
+                "Aufgaben", list(page_tasks_by_id), format_func=lambda task_id: f"#{task_id} – {page_tasks_by_id[task_id].title}"
+            )
+            bulk_label = st.selectbox("Aktion", list(BULK_ACTIONS))
+            bulk_action = BULK_ACTIONS[bulk_label]
+            bulk_value = None
+            if bulk_action == "priority":
+                bulk_value = st.selectbox("Neue Priorität", ["Low", "Medium", "High", "Urgent"])
+            elif bulk_action == "status":
+                bulk_value = st.selectbox("Neuer Status", ["To Do", "In Progress", "On Hold", "Completed", "Cancelled"])
+            elif bulk_action == "assign":
+                bulk_value = st.text_input("Zugewiesen an (leer = niemand)").strip()
+            elif bulk_action in ("add_tag", "remove_tag"):
+                bulk_value = st.text_input("Tag").strip()
+            bulk_confirmed = bulk_action != "delete" or st.checkbox("Löschen der ausgewählten Aufgaben bestätigen")
+            bulk_ready = bulk_ids and bulk_confirmed and (bulk_value or bulk_action not in ("add_tag", "remove_tag"))
+            if st.button(f"Auf {len(bulk_ids)} Aufgaben anwenden", disabled=not bulk_ready):
+                st.session_state.bulk_undo = apply_bulk_action(bulk_ids, bulk_action, bulk_value, label=bulk_label)
+                st.rerun()
+        selected_task_id = st.selectbox(
+            "Aufgabe öffnen",
+            [None] + list(page_tasks_by_id),
+            format_func=lambda task_id: "Bitte wählen …" if task_id is None else f"#{task_id} – {page_tasks_by_id[task_id].title}",
+            key="selected_task_id"
+        )
+        task = page_tasks_by_id.get(selected_task_id)
+        if task is not None:
+            with st.container(border=True):
+                st.markdown(f"### {task.title}")
                 st.write(f"**ID:** {task.id}")
                 st.write(f"**Beschreibung:** {task.description}")
                 st.write(f"**Fälligkeitsdatum:** {task.due_date.isoformat() if task.due_date else 'Nicht gesetzt'}")
@@ -767,77 +2960,149 @@ elif st.session_state.page == "Aufgaben verwalten":
                 st.rerun()
 
 
+# --- Kalender ---
+elif st.session_state.page == "Kalender":
+    st.header("Kalender")
+    col_cal_1, col_cal_2 = st.columns(2)
+    with col_cal_1:
+        calendar_view = st.radio("Ansicht", ["Monat", "Woche"], horizontal=True)
+    with col_cal_2:
+        reference_day = st.date_input("Datum", value=datetime.date.today())
+
+    # Sichtbares Fenster immer von Montag bis Sonntag
+    if calendar_view == "Monat":
+        first_day = reference_day.replace(day=1)
+        last_day = first_day.replace(day=calendar.monthrange(first_day.year, first_day.month)[1])
+    else:
+        first_day = last_day = reference_day
+    window_start = first_day - datetime.timedelta(days=first_day.weekday())
+    window_end = last_day + datetime.timedelta(days=6 - last_day.weekday())
+    calendar_entries = get_calendar_entries(shared_state.tasks, window_start, window_end)
+    max_entries_per_day = 4 if calendar_view == "Monat" else 20
+
+    st.caption("🔁 = geplanter Termin einer wiederkehrenden Aufgabe, der erst beim Bearbeiten oder Erledigen gespeichert wird.")
+    header_columns = st.columns(7)
+    for column, weekday in zip(header_columns, ["Mo", "Di", "Mi", "Do", "Fr", "Sa", "So"]):
+        column.markdown(f"**{weekday}**")
+    calendar_days = list(calendar_entries)
+    for week_start in range(0, len(calendar_days), 7):
+        for column, day in zip(st.columns(7), calendar_days[week_start:week_start + 7]):
+            with column:
+                day_label = f"**{day.day}.{day.month}.**" if day == datetime.date.today() else f"{day.day}.{day.month}."
+                if calendar_view == "Monat" and day.month != first_day.month:
+                    day_label = f":gray[{day_label}]"
+                lines = [day_label]
+                for entry in calendar_entries[day][:max_entries_per_day]:
+                    marker = "🔁" if entry["virtual"] else ("✅" if entry["status"] == "Completed" else "•")
+                    lines.append(f"{marker} {entry['title']}")
+                hidden = len(calendar_entries[day]) - max_entries_per_day
+                if hidden > 0:
+                    lines.append(f"+{hidden} weitere")
+                st.markdown("  \n".join(lines))
+
+    # Einzelnen Termin öffnen; virtuelle Termine werden erst hier bei einer Aktion gespeichert
+    window_entries = {entry["key"]: (day, entry) for day, day_entries in calendar_entries.items() for entry in day_entries}
+    selected_key = st.selectbox(
+        "Termin öffnen",
+        [None] + list(window_entries),
+        format_func=lambda key: "Bitte wählen …" if key is None else f"{window_entries[key][0].strftime('%d.%m.%Y')} – {window_entries[key][1]['title']}" + (" 🔁" if window_entries[key][1]["virtual"] else "")
+    )
+    if selected_key is not None:
+        selected_day, selected_entry = window_entries[selected_key]
+        template = selected_entry["task"]
+        with st.container(border=True):
+            st.markdown(f"### {selected_entry['title']}")
+            st.write(f"**Fällig:** {selected_day.isoformat()}")
+            st.write(f"**Priorität:** {template.priority}")
+            st.write(f"**Status:** {selected_entry['status']}")
+            st.write(f"**Zugewiesen an:** {template.assigned_to if template.assigned_to else 'Niemand'}")
+            if selected_entry["status"] != "Completed" and st.button("✅ Erledigt", key="calendar_complete"):
+                task = materialize_occurrence(*selected_key[1:]) if selected_entry["virtual"] else template
+                if task is not None:
+                    mark_task_as_completed(task.id)
+                    st.rerun()
+            with st.form("calendar_edit_form"):
+                edit_due_date = st.date_input("Fälligkeitsdatum", value=selected_day)
+                # Unbekannte Werte (z.B. aus Importen) wie im Bearbeitungsformular auf den ersten Eintrag setzen
+                priority_options = ["Low", "Medium", "High", "Urgent"]
+                status_options = ["To Do", "In Progress", "On Hold", "Completed", "Cancelled"]
+                try:
+                    current_priority_index = priority_options.index(template.priority)
+                except ValueError:
+                    current_priority_index = 0
+                try:
+                    current_status_index = status_options.index(selected_entry["status"])
+                except ValueError:
+                    current_status_index = 0
+                edit_priority = st.selectbox("Priorität", priority_options, index=current_priority_index)
+                edit_status = st.selectbox("Status", status_options, index=current_status_index)
+                edit_assigned_to = st.text_input("Zugewiesen an", value=template.assigned_to if template.assigned_to else "")
+                if st.form_submit_button("Änderungen speichern"):
+                    task = materialize_occurrence(*selected_key[1:]) if selected_entry["virtual"] else template
+                    if task is not None:
+                        update_task(task.id, task.title, task.description, edit_due_date, edit_priority, edit_status,
+                                    edit_assigned_to if edit_assigned_to else None, list(task.tags), task.recurrence)
+                        st.rerun()
+
 # --- Berichte & Analyse ---
 elif st.session_state.page == "Berichte & Analyse":
     st.header("Berichte & Analyse")
 
-    if not st.session_state.tasks:
+    if not shared_state.tasks:
         st.info("Keine Aufgaben zum Erstellen von Berichten vorhanden.")
     else:
-        df_tasks = pd.DataFrame([task.to_dict() for task in st.session_state.tasks])
-        
-        # Konvertiere due_date und created_at zu datetime Objekten
-        df_tasks['due_date'] = pd.to_datetime(df_tasks['due_date'], errors='coerce')
-        df_tasks['created_at'] = pd.to_datetime(df_tasks['created_at'], errors='coerce')
-        df_tasks['completed_at'] = pd.to_datetime(df_tasks['completed_at'], errors='coerce')
+        # Berichte werden nur nach einer Änderung am Aufgabenbestand neu berechnet
+        report = shared_state.report_cache.get_or_build("report", shared_state.version, lambda: build_task_report(shared_state.tasks))
 
         st.subheader("Aufgabenstatus-Verteilung")
-        status_counts = df_tasks['status'].value_counts().reset_index()
-        status_counts.columns = ['Status', 'Anzahl']
-        fig_status_pie = px.pie(status_counts, values='Anzahl', names='Status', title='Verteilung der Aufgaben nach Status')
-        st.plotly_chart(fig_status_pie, use_container_width=True)
+        st.plotly_chart(pio.from_json(report["status_pie"]), use_container_width=True)
 
         st.subheader("Aufgaben nach Priorität")
-        priority_counts = df_tasks['priority'].value_counts().reset_index()
-        priority_counts.columns = ['Priorität', 'Anzahl']
-        # Sortiere nach der gewünschten Prioritätsreihenfolge
-        priority_order_list = ["Urgent", "High", "Medium", "Low"]
-        priority_counts['Priorität'] = pd.Categorical(priority_counts['Priorität'], categories=priority_order_list, ordered=True)
-        priority_counts = priority_counts.sort_values('Priorität')
-        fig_priority_bar = px.bar(priority_counts, x='Priorität', y='Anzahl', title='Anzahl der Aufgaben nach Priorität', color='Priorität')
-        st.plotly_chart(fig_priority_bar, use_container_width=True)
+        st.plotly_chart(pio.from_json(report["priority_bar"]), use_container_width=True)
 
         st.subheader("Aufgaben-Erstellung über die Zeit")
-        df_tasks['creation_date'] = df_tasks['created_at'].dt.to_period('D') # Gruppierung nach Tag
-        daily_creations = df_tasks['creation_date'].value_counts().sort_index().reset_index()
-        daily_creations.columns = ['Datum', 'Anzahl']
-        daily_creations['Datum'] = daily_creations['Datum'].astype(str) # Für Plotly X-Achse
-        fig_time_series = px.line(daily_creations, x='Datum', y='Anzahl', title='Anzahl der täglich erstellten Aufgaben')
-        st.plotly_chart(fig_time_series, use_container_width=True)
+        st.plotly_chart(pio.from_json(report["creation_line"]), use_container_width=True)
 
         st.subheader("Durchschnittliche Erledigungszeit (für abgeschlossene Aufgaben)")
-        completed_df = df_tasks[df_tasks['status'] == 'Completed'].copy()
-        if not completed_df.empty:
-            completed_df['time_to_complete'] = (completed_df['completed_at'] - completed_df['created_at']).dt.days
-            avg_completion_time = completed_df['time_to_complete'].mean()
+        if report["completion_hist"] is not None:
+            avg_completion_time = report["avg_completion_days"]
             if not pd.isna(avg_completion_time):
                 st.info(f"Die durchschnittliche Zeit bis zur Erledigung einer Aufgabe beträgt: **{avg_completion_time:.2f} Tage**")
             else:
                 st.info("Es gibt nicht genügend Daten, um die durchschnittliche Erledigungszeit zu berechnen (Stellen Sie sicher, dass sowohl Erstellungs- als auch Abschlussdaten vorhanden sind).")
             
             # Histogramm der Erledigungszeiten
-            fig_completion_hist = px.histogram(completed_df, x='time_to_complete', nbins=10, title='Verteilung der Erledigungszeiten (in Tagen)')
-            st.plotly_chart(fig_completion_hist, use_container_width=True)
+            st.plotly_chart(pio.from_json(report["completion_hist"]), use_container_width=True)
 
         else:
             st.info("Keine abgeschlossenen Aufgaben zum Analysieren der Erledigungszeit vorhanden.")
 
+        st.subheader("Durchlaufzeiten (Perzentile)")
+        lead_time_count, lead_time_quantiles = report["lead_time_overall"]
+        if lead_time_count:
+            col_p50, col_p90, col_p99 = st.columns(3)
+            col_p50.metric("p50", f"{lead_time_quantiles[0]:.2f} Tage")
+            col_p90.metric("p90", f"{lead_time_quantiles[1]:.2f} Tage")
+            col_p99.metric("p99", f"{lead_time_quantiles[2]:.2f} Tage")
+            tab_assignee, tab_priority, tab_tag = st.tabs(["Nach zugewiesener Person", "Nach Priorität", "Nach Tag"])
+            with tab_assignee:
+                st.dataframe(report["lead_time_tables"]["assignee"], hide_index=True, use_container_width=True)
+            with tab_priority:
+                st.dataframe(report["lead_time_tables"]["priority"], hide_index=True, use_container_width=True)
+            with tab_tag:
+                st.dataframe(report["lead_time_tables"]["tag"], hide_index=True, use_container_width=True)
+        else:
+            st.info("Keine abgeschlossenen Aufgaben mit Erstellungs- und Abschlussdatum vorhanden.")
+
         st.subheader("Aufgaben nach zugewiesener Person")
-        assigned_to_counts = df_tasks['assigned_to'].value_counts().reset_index()
-        assigned_to_counts.columns = ['Zugewiesen an', 'Anzahl']
-        if not assigned_to_counts.empty:
-            fig_assigned_to = px.bar(assigned_to_counts, x='Zugewiesen an', y='Anzahl', title='Anzahl der Aufgaben pro zugewiesener Person', color='Zugewiesen an')
-            st.plotly_chart(fig_assigned_to, use_container_width=True)
+        if report["assignee_bar"] is not None:
+            st.plotly_chart(pio.from_json(report["assignee_bar"]), use_container_width=True)
         else:
             st.info("Keine Aufgaben mit Zuweisungen gefunden.")
 
         st.subheader("Aufgaben nach Tags")
-        all_tags_flat = [tag for sublist in df_tasks['tags'].dropna() for tag in sublist]
-        if all_tags_flat:
-            tag_counts = pd.Series(all_tags_flat).value_counts().reset_index()
-            tag_counts.columns = ['Tag', 'Anzahl']
-            fig_tags = px.bar(tag_counts, x='Tag', y='Anzahl', title='Anzahl der Aufgaben pro Tag', color='Tag')
-            st.plotly_chart(fig_tags, use_container_width=True)
+        if report["tags_bar"] is not None:
+            st.plotly_chart(pio.from_json(report["tags_bar"]), use_container_width=True)
         else:
             st.info("Keine Tags für Aufgaben gefunden.")
 
@@ -856,39 +3121,65 @@ elif st.session_state.page == "Einstellungen":
     st.subheader("Datenmanagement")
     st.write("Hier können Sie Ihre Aufgabenliste exportieren oder importieren.")
 
-    # Exportieren der Aufgaben
-    tasks_data_for_export = [task.to_dict() for task in st.session_state.tasks]
-    json_export_str = json.dumps(tasks_data_for_export, indent=4, ensure_ascii=False)
-    st.download_button(
-        label="Aufgaben als JSON exportieren",
-        data=json_export_str,
-        file_name="tasks_export.json",
-        mime="application/json"
-    )
+    # Exportieren der Aufgaben: erst auf Knopfdruck in eine Datei schreiben, Reruns lesen nur diese Datei
+    col_export_1, col_export_2 = st.columns(2)
+    with col_export_1:
+        export_format = st.selectbox("Exportformat", list(EXPORT_FORMATS))
+    with col_export_2:
+        export_compress = st.checkbox("gzip-komprimiert", help="Gilt für JSON, JSON Lines und CSV; Parquet ist bereits komprimiert.")
+    prepare_export = st.button("Export vorbereiten")
+
+    # Delta-Export: nur Änderungen und Löschungen seit einer Version, z.B. für Replikate oder Berichtsjobs
+    col_delta_1, col_delta_2 = st.columns(2)
+    with col_delta_1:
+        delta_cursor = st.number_input("Änderungen seit Version (0 = alle Aufgaben)", min_value=0, value=0, step=1)
+    with col_delta_2:
+        st.metric("Aktuelle Version", shared_state.tasks.revision)
+    prepare_delta = st.button("Delta exportieren")
+
+    if prepare_export or prepare_delta:
+        discard_export_file()
+        remove_stale_export_files()
+        st.session_state.export_file = write_export_file(export_format, export_compress) if prepare_export else write_delta_export(int(delta_cursor))
+    # Download einmal anbieten; nach dem Klick wird die Datei entfernt, spätere Reruns lesen sie nicht mehr
+    export_file = st.session_state.get("export_file")
+    if export_file and os.path.exists(export_file[0]):
+        export_path, export_file_name, export_mime = export_file
+        with open(export_path, "rb") as f:
+            st.download_button(
+                label=f"{export_file_name} herunterladen",
+                data=f,
+                file_name=export_file_name,
+                mime=export_mime,
+                on_click=discard_export_file
+            )
 
     # Importieren von Aufgaben
     st.markdown("---")
     st.subheader("Aufgaben importieren")
-    uploaded_file = st.file_uploader("Wählen Sie eine JSON-Datei mit Aufgaben zum Import", type="json")
-    if uploaded_file is not None:
+    duplicate_modes = {"Überspringen": "skip", "Zusammenführen (Status, Priorität, Notizen übernehmen)": "merge", "Trotzdem importieren": "keep"}
+    duplicate_choice = st.radio("Bereits vorhandene Aufgaben", list(duplicate_modes), horizontal=True,
+                                help="Duplikat = gleicher Titel, Beschreibung, Fälligkeit, Zuständige, Tags und Erstellungszeitpunkt.")
+    near_duplicates = st.checkbox("Auch Aufgaben mit sehr ähnlichem Titel als Duplikat behandeln")
+    uploaded_file = st.file_uploader("Wählen Sie eine JSON-Datei oder einen Parquet-Export (ZIP) mit Aufgaben zum Import", type=["json", "zip", "parquet"])
+    # file_id merken, damit dieselbe Datei nach dem Rerun nicht erneut importiert wird
+    if uploaded_file is not None and st.session_state.get("imported_file_id") != uploaded_file.file_id:
+        import_progress = st.progress(0.0, text="Import wird gelesen …")
         try:
-            imported_data = json.load(uploaded_file)
-            if isinstance(imported_data, list):
-                new_tasks = []
-                for task_data in imported_data:
-                    # Um Konflikte zu vermeiden, vergeben wir neue IDs für importierte Aufgaben
-                    task_data["id"] = st.session_state.next_task_id
-                    new_task = Task.from_dict(task_data)
-                    new_tasks.append(new_task)
-                    st.session_state.next_task_id += 1
-                
-                st.session_state.tasks.extend(new_tasks)
-                save_tasks(st.session_state.tasks)
-                st.success(f"{len(new_tasks)} Aufgaben erfolgreich importiert!")
-                st.rerun()
+            report_import_progress = lambda count, fraction: import_progress.progress(fraction, text=f"{count} Aufgaben geprüft …")
+            if uploaded_file.name.lower().endswith((".zip", ".parquet")):
+                import_stats = import_tasks_from_parquet(uploaded_file, report_import_progress, duplicate_modes[duplicate_choice], near_duplicates)
             else:
-                st.error("Die importierte JSON-Datei sollte eine Liste von Aufgabenobjekten enthalten.")
-        except json.JSONDecodeError:
+                import_stats = import_tasks_from_json(uploaded_file, uploaded_file.size, report_import_progress,
+                                                      duplicate_modes[duplicate_choice], near_duplicates)
+            import_progress.progress(1.0, text="Import abgeschlossen")
+            st.session_state.imported_file_id = uploaded_file.file_id
+            st.success(f"{import_stats['imported']} Aufgaben erfolgreich importiert, {import_stats['merged']} zusammengeführt, "
+                       f"{import_stats['skipped']} Duplikate übersprungen.")
+            st.rerun()
+        except TaskImportError as e:
+            st.error(str(e))
+        except (json.JSONDecodeError, UnicodeDecodeError):
             st.error("Fehler beim Dekodieren der JSON-Datei. Bitte stellen Sie sicher, dass es sich um eine gültige JSON-Datei handelt.")
         except Exception as e:
             st.error(f"Ein unerwarteter Fehler ist aufgetreten: {e}")